@@ -0,0 +1,184 @@
+import hashlib
+import logging
+import math
+import os
+import threading
+from collections import OrderedDict
+
+from qdrant_client import models
+
+from src.common import metrics
+
+# ===============================
+# CONFIG
+# ===============================
+BLOOM_CAPACITY = int(os.getenv("DEDUPE_BLOOM_CAPACITY") or 1_000_000)
+BLOOM_ERROR_RATE = 0.01
+RECENT_SIZE = 100_000  # exact (user, file hash) pairs known to be stored
+WARM_PAGE_SIZE = 1_000
+# set when this is the only process ingesting into the collection: one
+# uvicorn worker, one replica. Only then is a Bloom miss a sure "not stored".
+DEDUPE_SINGLE_WRITER = (os.getenv("DEDUPE_SINGLE_WRITER") or "").lower() in ("1", "true")
+
+
+class DedupeIndex:
+    """
+    Local view of which (user id, file hash) pairs are stored.
+
+    An LRU of exact pairs answers "stored" for recently seen documents.
+    With `single_writer`, a Bloom filter warmed from Qdrant also answers
+    "definitely not stored" without a network call. Anything else is
+    unsure and the caller must ask Qdrant.
+
+    The view only covers writes made through this process. When other
+    workers or replicas ingest too, a document they stored after warm-up
+    would look new here, so negatives are only trusted with
+    `single_writer`.
+    """
+
+    def __init__(
+        self,
+        capacity: int = BLOOM_CAPACITY,
+        error_rate: float = BLOOM_ERROR_RATE,
+        recent_size: int = RECENT_SIZE,
+        single_writer: bool = DEDUPE_SINGLE_WRITER,
+    ):
+        self._bits_count = max(
+            8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        )
+        self._hash_count = max(1, round(self._bits_count / capacity * math.log(2)))
+        self._bits = bytearray((self._bits_count + 7) // 8)
+        self._recent: OrderedDict[tuple[str, str], None] = OrderedDict()
+        self._recent_size = recent_size
+        self._lock = threading.Lock()
+        self._single_writer = single_writer
+        self._ready = False
+
+        self.keys_added = 0
+        self.negative_hits = 0
+        self.positive_hits = 0
+        self.misses = 0
+        self.false_positives = 0
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def add(self, user_id: str, file_hash: str) -> None:
+        positions = self._positions(user_id, file_hash)
+
+        with self._lock:
+            for pos in positions:
+                self._bits[pos >> 3] |= 1 << (pos & 7)
+            self.keys_added += 1
+            self._remember((user_id, file_hash))
+
+    def discard(self, user_id: str, file_hash: str) -> None:
+        # Bloom bits can't be cleared; the pair just becomes "unsure" again
+        with self._lock:
+            self._recent.pop((user_id, file_hash), None)
+
+    def lookup(self, user_id: str, file_hash: str) -> bool | None:
+        """True: stored. False: not stored. None: unsure, ask Qdrant."""
+        key = (user_id, file_hash)
+        positions = self._positions(user_id, file_hash)
+
+        with self._lock:
+            if key in self._recent:
+                self._recent.move_to_end(key)
+                self.positive_hits += 1
+                return True
+
+            if self._ready and not all(
+                self._bits[pos >> 3] & (1 << (pos & 7)) for pos in positions
+            ):
+                self.negative_hits += 1
+                return False
+
+            self.misses += 1
+            return None
+
+    def record(self, user_id: str, file_hash: str, exists: bool) -> None:
+        """Feed back the answer Qdrant gave for an unsure lookup."""
+        if exists:
+            self.add(user_id, file_hash)
+        elif self._ready:
+            with self._lock:
+                self.false_positives += 1
+
+    def warm(self, qclient, collection_name: str) -> None:
+        """
+        Load every stored (user, file hash) pair; negatives stay unsure
+        until done. Only the first chunk of each document is read, so this
+        scrolls one point per document rather than every chunk.
+        """
+        if not self._single_writer:
+            logging.info("dedupe index: several writers possible, negatives go to Qdrant")
+            return
+
+        try:
+            offset = None
+            while True:
+                points, offset = qclient.scroll(
+                    collection_name=collection_name,
+                    scroll_filter=models.Filter(
+                        must=[
+                            models.FieldCondition(
+                                key="_chunk_index",
+                                match=models.MatchValue(value=0),
+                            )
+                        ]
+                    ),
+                    limit=WARM_PAGE_SIZE,
+                    offset=offset,
+                    with_payload=["_user_id", "_file_hash"],
+                    with_vectors=False,
+                )
+
+                for key in {
+                    (p.payload.get("_user_id"), p.payload.get("_file_hash"))
+                    for p in points
+                    if p.payload
+                }:
+                    if key[0] is not None and key[1] is not None:
+                        self.add(*key)
+
+                if offset is None:
+                    break
+
+            self._ready = True
+            logging.info(f"dedupe index warmed with {self.keys_added} documents")
+
+        except Exception as e:
+            logging.error(f"dedupe index warm-up failed, using Qdrant only: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "single_writer": self._single_writer,
+                "ready": self._ready,
+                "keys_added": self.keys_added,
+                "recent_size": len(self._recent),
+                "negative_hits": self.negative_hits,
+                "positive_hits": self.positive_hits,
+                "misses": self.misses,
+                "false_positives": self.false_positives,
+            }
+
+    def _remember(self, key: tuple[str, str]) -> None:
+        self._recent[key] = None
+        self._recent.move_to_end(key)
+        if len(self._recent) > self._recent_size:
+            self._recent.popitem(last=False)
+
+    def _positions(self, user_id: str, file_hash: str) -> list[int]:
+        digest = hashlib.blake2b(
+            f"{user_id}\x00{file_hash}".encode("utf-8"), digest_size=16
+        ).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self._bits_count for i in range(self._hash_count)]
+
+
+dedupe_index = DedupeIndex()
+metrics.register("dedupe_index", dedupe_index.stats)
@@ -0,0 +1,83 @@
+from typing import Dict
+
+from fastembed import TextEmbedding
+from fastembed.common.model_description import ModelSource, PoolingType
+from pydantic import BaseModel
+
+E5_QUERY_PREFIX = "query: "
+E5_PASSAGE_PREFIX = "passage:\n"
+BGE_QUERY_PREFIX = "Represent this sentence for searching relevant passages: "
+
+
+class CustomOnnx(BaseModel):
+    """An ONNX export fastembed doesn't ship, registered under the option's name."""
+
+    hf_repo: str
+    model_file: str
+    dim: int
+    pooling: PoolingType = PoolingType.MEAN
+    normalization: bool = True
+
+
+class DenseModelOption(BaseModel):
+    # fastembed model name; also namespaces the embedding cache
+    name: str
+    query_prefix: str = ""
+    passage_prefix: str = ""
+    custom: CustomOnnx | None = None
+
+
+# selected with DENSE_MODEL. Vectors of different options are not
+# comparable, so switching means re-ingesting into a fresh collection.
+DENSE_MODELS: Dict[str, DenseModelOption] = {
+    "e5-small": DenseModelOption(
+        name="intfloat/multilingual-e5-small",
+        query_prefix=E5_QUERY_PREFIX,
+        passage_prefix=E5_PASSAGE_PREFIX,
+        custom=CustomOnnx(
+            hf_repo="intfloat/multilingual-e5-small",
+            model_file="onnx/model.onnx",
+            dim=384,
+        ),
+    ),
+    # same weights, dynamic int8 quantization
+    "e5-small-int8": DenseModelOption(
+        name="Xenova/multilingual-e5-small-int8",
+        query_prefix=E5_QUERY_PREFIX,
+        passage_prefix=E5_PASSAGE_PREFIX,
+        custom=CustomOnnx(
+            hf_repo="Xenova/multilingual-e5-small",
+            model_file="onnx/model_quantized.onnx",
+            dim=384,
+        ),
+    ),
+    # English only; fastembed serves a quantized export
+    "bge-small-en": DenseModelOption(
+        name="BAAI/bge-small-en-v1.5",
+        query_prefix=BGE_QUERY_PREFIX,
+    ),
+    "arctic-xs": DenseModelOption(
+        name="snowflake/snowflake-arctic-embed-xs",
+        query_prefix=BGE_QUERY_PREFIX,
+    ),
+    "minilm-multilingual": DenseModelOption(
+        name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
+    ),
+}
+
+
+def register_custom(option: DenseModelOption) -> None:
+    if option.custom is None:
+        return
+
+    if any(m.model == option.name for m in TextEmbedding._list_supported_models()):
+        return
+
+    TextEmbedding.add_custom_model(
+        model=option.name,
+        pooling=option.custom.pooling,
+        normalization=option.custom.normalization,
+        sources=ModelSource(hf=option.custom.hf_repo),
+        dim=option.custom.dim,
+        model_file=option.custom.model_file,
+    )
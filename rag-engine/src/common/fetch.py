@@ -0,0 +1,113 @@
+import asyncio
+import hashlib
+import os
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+
+import httpx
+from fastapi import HTTPException, status
+from pydantic import BaseModel
+
+# ===============================
+# CONFIG
+# ===============================
+FETCH_TIMEOUT = 10
+MAX_DOWNLOAD_BYTES = int(os.getenv("MAX_DOWNLOAD_BYTES") or 200 * 1024 * 1024)
+PER_HOST_CONCURRENCY = 4
+# bodies being downloaded or handed over, across all batch requests
+MAX_CONCURRENT_DOWNLOADS = int(os.getenv("MAX_CONCURRENT_DOWNLOADS") or 8)
+
+_client: httpx.AsyncClient | None = None
+_download_slots = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+
+
+class Download(BaseModel):
+    url: str
+    content: bytes
+    content_type: str
+    file_hash: str
+
+    @property
+    def filename(self) -> str:
+        return os.path.basename(urlparse(self.url).path)
+
+
+def get_client() -> httpx.AsyncClient:
+    """Shared client, so connections to the same host are kept alive and reused."""
+    global _client
+
+    if _client is None:
+        _client = httpx.AsyncClient(
+            # waiting for a free connection is not a slow server
+            timeout=httpx.Timeout(FETCH_TIMEOUT, pool=None),
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        )
+
+    return _client
+
+
+async def fetch_url(url: str, max_bytes: int = MAX_DOWNLOAD_BYTES) -> Download:
+    """
+    Stream `url` into memory, hashing as it arrives, and stop as soon as
+    the body would exceed `max_bytes`.
+    """
+    digest = hashlib.sha256()
+    body = bytearray()
+
+    try:
+        async with get_client().stream("GET", url) as resp:
+            if resp.status_code >= 400:
+                raise HTTPException(
+                    status.HTTP_400_BAD_REQUEST,
+                    f"Failed to fetch URL, status {resp.status_code}",
+                )
+
+            declared = resp.headers.get("Content-Length", "")
+            if declared.isdigit() and int(declared) > max_bytes:
+                raise _too_large(max_bytes)
+
+            async for part in resp.aiter_bytes():
+                if len(body) + len(part) > max_bytes:
+                    raise _too_large(max_bytes)
+                digest.update(part)
+                body.extend(part)
+
+            content_type = resp.headers.get("Content-Type", "").lower()
+
+    except (httpx.HTTPError, httpx.InvalidURL) as e:
+        raise HTTPException(
+            status.HTTP_400_BAD_REQUEST,
+            f"Failed to fetch URL: {e.__class__.__name__}",
+        )
+
+    return Download(
+        url=url,
+        content=bytes(body),
+        content_type=content_type,
+        file_hash=digest.hexdigest(),
+    )
+
+
+def host_limits(per_host: int = PER_HOST_CONCURRENCY) -> defaultdict[str, asyncio.Semaphore]:
+    """Per-host download limits for one batch, keyed by netloc."""
+    return defaultdict(lambda: asyncio.Semaphore(per_host))
+
+
+@asynccontextmanager
+async def download_slot(url: str, limits: defaultdict[str, asyncio.Semaphore]):
+    """
+    Hold a download slot on `url`'s host and one of the process-wide
+    MAX_CONCURRENT_DOWNLOADS. Keep it until the body has been handed
+    over, so that bounds how many bodies sit in memory.
+    """
+    async with limits[urlparse(url).netloc], _download_slots:
+        yield
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        413,
+        f"Remote file is larger than {max_bytes} bytes",
+    )
@@ -0,0 +1,28 @@
+from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse
+
+from src.common.model_registry import model_registry
+
+health_router = APIRouter(tags=["Health"])
+
+
+@health_router.get(
+    "/healthz",
+    summary="Liveness: the process is up and serving requests",
+    status_code=status.HTTP_200_OK,
+)
+def healthz():
+    return {"status": "ok"}
+
+
+@health_router.get(
+    "/readyz",
+    summary="Readiness: every model is loaded and warmed up and Qdrant is reachable",
+    responses={503: {"description": "Still loading, or a component failed"}},
+)
+def readyz():
+    ready = model_registry.ready()
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"ready": ready, "components": model_registry.status()},
+    )
@@ -0,0 +1,214 @@
+import itertools
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Tuple
+
+from src.common import metrics
+
+# ===============================
+# CONFIG
+# ===============================
+QUERY = 0  # interactive requests, served first
+INGEST = 1  # bulk embedding of uploaded documents
+
+
+def _cpu_budget() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+CPU_BUDGET = int(os.getenv("INFERENCE_CPUS") or _cpu_budget())
+# intra-op threads of every ONNX session
+ONNX_THREADS = int(os.getenv("ONNX_THREADS") or min(4, max(1, CPU_BUDGET // 2)))
+# model calls running at once; slots * ONNX_THREADS stays within the budget
+INFERENCE_SLOTS = int(
+    os.getenv("INFERENCE_SLOTS") or max(1, CPU_BUDGET // ONNX_THREADS)
+)
+# how long a micro-batch waits for more callers, and when it stops waiting
+BATCH_WINDOW_SECONDS = float(os.getenv("BATCH_WINDOW_MS") or 2) / 1000
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS") or 32)
+
+
+class InferenceScheduler:
+    """
+    Single owner of the CPU time spent in model inference.
+
+    A fixed set of worker threads ("slots") each runs one model call at a
+    time, and every ONNX session is created with ONNX_THREADS intra-op
+    threads, so concurrent calls never oversubscribe the cores. Waiting
+    calls are served by priority, QUERY before INGEST, in FIFO order
+    within a priority; a query therefore waits at most for the ingest
+    calls already running, not for the ingest backlog.
+
+    Submitted functions must not submit and wait on other work, or they
+    can deadlock a fully busy scheduler.
+    """
+
+    def __init__(self, slots: int = INFERENCE_SLOTS):
+        self.slots = slots
+        self._queue: queue.PriorityQueue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+        self._waiting = {QUERY: 0, INGEST: 0}
+        self._started = {QUERY: 0, INGEST: 0}
+        self._wait_seconds = {QUERY: 0.0, INGEST: 0.0}
+
+        for i in range(slots):
+            threading.Thread(
+                target=self._work, name=f"inference-{i}", daemon=True
+            ).start()
+
+    def submit(self, priority: int, fn: Callable[..., Any], *args) -> Future:
+        future: Future = Future()
+
+        with self._lock:
+            self._waiting[priority] += 1
+
+        self._queue.put((priority, next(self._seq), time.monotonic(), future, fn, args))
+        return future
+
+    def run(self, priority: int, fn: Callable[..., Any], *args) -> Any:
+        return self.submit(priority, fn, *args).result()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "slots": self.slots,
+                "onnx_threads": ONNX_THREADS,
+                **{
+                    name: {
+                        "waiting": self._waiting[p],
+                        "started": self._started[p],
+                        "avg_wait_ms": round(
+                            1000 * self._wait_seconds[p] / self._started[p], 2
+                        )
+                        if self._started[p]
+                        else 0.0,
+                    }
+                    for name, p in (("query", QUERY), ("ingest", INGEST))
+                },
+            }
+
+    def _work(self) -> None:
+        while True:
+            priority, _, queued_at, future, fn, args = self._queue.get()
+
+            with self._lock:
+                self._waiting[priority] -= 1
+                self._started[priority] += 1
+                self._wait_seconds[priority] += time.monotonic() - queued_at
+
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+
+class MicroBatcher:
+    """
+    Coalesces small concurrent calls of `fn(items) -> results` (one
+    result per item, in order) into one scheduled call.
+
+    The first caller opens a batch; it is sent once `window` seconds have
+    passed or `max_items` items are waiting, whichever comes first, and
+    each caller gets back the slice of results for its own items. While
+    one batch runs the next one is already collecting.
+    """
+
+    def __init__(
+        self,
+        fn: Callable[[List[Any]], List[Any]],
+        scheduler: InferenceScheduler,
+        priority: int = QUERY,
+        window: float = BATCH_WINDOW_SECONDS,
+        max_items: int = BATCH_MAX_ITEMS,
+    ):
+        self._fn = fn
+        self._scheduler = scheduler
+        self._priority = priority
+        self._window = window
+        self._max_items = max_items
+
+        self._pending: List[Tuple[List[Any], Future]] = []
+        self._pending_items = 0
+        self._cond = threading.Condition()
+
+        self.batches = 0
+        self.items = 0
+
+        threading.Thread(
+            target=self._dispatch, name="micro-batcher", daemon=True
+        ).start()
+
+    def submit(self, items: List[Any]) -> Future:
+        future: Future = Future()
+
+        if not items:
+            future.set_result([])
+            return future
+
+        with self._cond:
+            self._pending.append((items, future))
+            self._pending_items += len(items)
+            self._cond.notify()
+
+        return future
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "batches": self.batches,
+                "items": self.items,
+                "avg_batch_size": round(self.items / self.batches, 2)
+                if self.batches
+                else 0.0,
+            }
+
+    def _dispatch(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+
+                deadline = time.monotonic() + self._window
+                while self._pending_items < self._max_items:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+                waiting, self._pending = self._pending, []
+                self._pending_items = 0
+                self.batches += 1
+                self.items += sum(len(items) for items, _ in waiting)
+
+            flat = [item for items, _ in waiting for item in items]
+            result = self._scheduler.submit(self._priority, self._fn, flat)
+            result.add_done_callback(lambda f, waiting=waiting: _fan_out(f, waiting))
+
+
+def _fan_out(result: Future, waiting: List[Tuple[List[Any], Future]]) -> None:
+    error = result.exception()
+    if error is not None:
+        for _, future in waiting:
+            future.set_exception(error)
+        return
+
+    values = result.result()
+    start = 0
+    for items, future in waiting:
+        future.set_result(values[start : start + len(items)])
+        start += len(items)
+
+
+inference = InferenceScheduler()
+metrics.register("inference", inference.stats)
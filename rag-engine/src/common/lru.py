@@ -0,0 +1,69 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Tuple
+
+
+class LRUCache:
+    """
+    Thread-safe mapping bounded to `maxsize` entries; the least recently
+    used entry is dropped first. Counts hits and misses for /stats.
+    """
+
+    def __init__(self, maxsize: int):
+        self._data: OrderedDict[Hashable, Any] = OrderedDict()
+        self._maxsize = maxsize
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Any | None:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        self.put_many([(key, value)])
+
+    def get_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, Any]:
+        """Entries found for `keys`; absent keys are left out."""
+        found = {}
+
+        with self._lock:
+            for key in keys:
+                if key in self._data:
+                    self._data.move_to_end(key)
+                    found[key] = self._data[key]
+                    self.hits += 1
+                else:
+                    self.misses += 1
+
+        return found
+
+    def put_many(self, items: Iterable[Tuple[Hashable, Any]]) -> None:
+        with self._lock:
+            for key, value in items:
+                self._data[key] = value
+                self._data.move_to_end(key)
+
+            while len(self._data) > self._maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self._maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "evictions": self.evictions,
+            }
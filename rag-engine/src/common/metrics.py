@@ -0,0 +1,24 @@
+from typing import Callable
+from fastapi import APIRouter, status
+
+metrics_router = APIRouter(tags=["Metrics"])
+
+_sources: dict[str, Callable[[], dict]] = {}
+
+
+def register(name: str, stats: Callable[[], dict]) -> None:
+    """Expose `stats()` under `name` on the /stats endpoint."""
+    _sources[name] = stats
+
+
+def collect() -> dict[str, dict]:
+    return {name: stats() for name, stats in _sources.items()}
+
+
+@metrics_router.get(
+    "/stats",
+    summary="Hit/miss counters of the in-process caches and indexes",
+    status_code=status.HTTP_200_OK,
+)
+def get_stats():
+    return collect()
@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from fastapi import HTTPException, status
+
+
+class ModelRegistry:
+    """
+    Named resources (models, clients) that are loaded in parallel on
+    background threads instead of at import time.
+
+    Loading starts with `start()`, or with the first `get()`. `get()`
+    blocks until the resource is loaded and warmed up, so early requests
+    wait rather than fail, and raises 503 if loading failed.
+    """
+
+    def __init__(self):
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._warmups: Dict[str, Callable[[Any], Any] | None] = {}
+        self._futures: Dict[str, Future] = {}
+        self._state: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def register(
+        self,
+        name: str,
+        loader: Callable[[], Any],
+        warmup: Callable[[Any], Any] | None = None,
+    ) -> None:
+        """`warmup(resource)` runs once after loading, before it counts as ready."""
+        self._loaders[name] = loader
+        self._warmups[name] = warmup
+        self._state[name] = {"state": "pending"}
+
+    def start(self) -> None:
+        with self._lock:
+            if self._futures:
+                return
+
+            pool = ThreadPoolExecutor(
+                max_workers=max(1, len(self._loaders)),
+                thread_name_prefix="model-load",
+            )
+            for name in self._loaders:
+                self._state[name] = {"state": "loading"}
+                self._futures[name] = pool.submit(self._load, name)
+            pool.shutdown(wait=False)
+
+    def get(self, name: str) -> Any:
+        if name not in self._futures:
+            self.start()
+
+        try:
+            return self._futures[name].result()
+        except Exception:
+            raise _failed(name)
+
+    async def aget(self, name: str) -> Any:
+        """`get` for coroutines: waits without blocking the event loop."""
+        if name not in self._futures:
+            self.start()
+
+        try:
+            return await asyncio.wrap_future(self._futures[name])
+        except Exception:
+            raise _failed(name)
+
+    def ready(self) -> bool:
+        return all(s["state"] == "ready" for s in self.status().values())
+
+    def status(self) -> Dict[str, dict]:
+        with self._lock:
+            return {name: dict(state) for name, state in self._state.items()}
+
+    def _load(self, name: str) -> Any:
+        started = time.monotonic()
+
+        try:
+            resource = self._loaders[name]()
+
+            warmup = self._warmups[name]
+            if warmup is not None:
+                warmup(resource)
+
+        except Exception as e:
+            logging.error(f"loading {name} failed: {e}")
+            with self._lock:
+                self._state[name] = {"state": "failed", "error": str(e)}
+            raise
+
+        seconds = round(time.monotonic() - started, 2)
+        logging.info(f"{name} ready in {seconds}s")
+        with self._lock:
+            self._state[name] = {"state": "ready", "seconds": seconds}
+
+        return resource
+
+
+def _failed(name: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=f"{name} failed to load",
+    )
+
+
+model_registry = ModelRegistry()
@@ -0,0 +1,108 @@
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Hashable, Tuple
+
+from src.common import metrics
+
+# ===============================
+# CONFIG
+# ===============================
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL") or 300)
+QUERY_CACHE_MAX_BYTES = int(os.getenv("QUERY_CACHE_MAX_BYTES") or 64 * 1024 * 1024)
+
+
+class QueryCache:
+    """
+    Finished query results, bounded by TTL and by the approximate size of
+    the cached responses.
+
+    Every key embeds the user's current generation, and ingesting or
+    deleting a document bumps it, so a user's cached answers stop
+    matching as soon as their corpus changes. Stale entries are never
+    read again and age out through TTL and LRU eviction.
+
+    Generations live in process memory: with several workers or replicas,
+    an ingest only invalidates the cache of the worker that ran it, and
+    the others can serve answers up to QUERY_CACHE_TTL old. Lower the TTL
+    for such deployments, or set it to 0 to turn the cache off.
+    """
+
+    def __init__(
+        self,
+        ttl: float = QUERY_CACHE_TTL,
+        max_bytes: int = QUERY_CACHE_MAX_BYTES,
+    ):
+        self._ttl = ttl
+        self._max_bytes = max_bytes
+        self._entries: OrderedDict[Hashable, Tuple[float, int, Any]] = OrderedDict()
+        self._generations: defaultdict[str, int] = defaultdict(int)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def key(self, user_id: str, *parts: Hashable) -> Hashable:
+        with self._lock:
+            return (user_id, self._generations[user_id], *parts)
+
+    def get(self, key: Hashable) -> Any | None:
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key: Hashable, value: Any, size: int) -> None:
+        if size > self._max_bytes or self._ttl <= 0:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+            self._entries[key] = (time.monotonic() + self._ttl, size, value)
+            self._bytes += size
+
+            while self._bytes > self._max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def bump(self, user_id: str) -> None:
+        """Invalidate every cached result of `user_id`."""
+        with self._lock:
+            self._generations[user_id] += 1
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self._max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _drop(self, key: Hashable) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+
+query_cache = QueryCache()
+metrics.register("query_cache", query_cache.stats)
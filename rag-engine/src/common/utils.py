@@ -1,12 +1,19 @@
+import logging
 import os
+import threading
+import time
 from pathlib import Path as FilePath
 from fastembed import SparseTextEmbedding, TextEmbedding
-from fastembed.common.model_description import ModelSource, PoolingType
-from qdrant_client import QdrantClient, models
+from qdrant_client import AsyncQdrantClient, QdrantClient, models
 from qdrant_client.conversions.common_types import SparseVectorParams
+from qdrant_client.http.exceptions import ResponseHandlingException, UnexpectedResponse
 from fastembed.rerank.cross_encoder import TextCrossEncoder
 import json
 from fastapi import HTTPException, status
+from src.common.dedupe import dedupe_index
+from src.common.dense_models import DENSE_MODELS, register_custom
+from src.common.inference import ONNX_THREADS
+from src.common.model_registry import model_registry
 from qdrant_client.models import Optional
 from qdrant_client.models import (
     Distance,
@@ -18,41 +25,129 @@ from qdrant_client.models import (
 
 CACHE_DIR = FilePath("./models_cache")
 CACHE_DIR.mkdir(exist_ok=True)
-VECTOR_SIZE = 384
-COLLECTION_NAME = "dcup_documents"
-
-TextEmbedding.add_custom_model(
-    model="intfloat/multilingual-e5-small",
-    pooling=PoolingType.MEAN,
-    normalization=True,
-    sources=ModelSource(hf="intfloat/multilingual-e5-small"),
-    dim=VECTOR_SIZE,
-    model_file="onnx/model.onnx",
-)
-dense_embedding = TextEmbedding(
-    model_name="intfloat/multilingual-e5-small",
-    cache_dir=str(CACHE_DIR),
-)
-sparse_embedding = SparseTextEmbedding(
-    model_name="prithivida/Splade_PP_en_v1",
-    cache_dir=str(CACHE_DIR),
-)
-reranker = TextCrossEncoder(
-    model_name="Xenova/ms-marco-MiniLM-L-12-v2",
-    cache_dir=str(CACHE_DIR),
-)
+COLLECTION_NAME = os.getenv("QDRANT_COLLECTION") or "dcup_documents"
+DENSE_MODEL = DENSE_MODELS[os.getenv("DENSE_MODEL") or "e5-small"]
+DENSE_MODEL_NAME = DENSE_MODEL.name
+SPARSE_MODEL_NAME = "prithivida/Splade_PP_en_v1"
+RERANK_MODEL_NAME = "Xenova/ms-marco-MiniLM-L-12-v2"
+QDRANT_RETRY_MAX_SECONDS = 30
+
+register_custom(DENSE_MODEL)
 
-qclient = QdrantClient(
+# reach these through get_qdrant / get_async_qdrant, which wait for the
+# collection to exist
+_qclient = QdrantClient(
+    url=os.getenv("QDRANT_DB_URL"),
+    api_key=os.getenv("QDRANT_DB_KEY"),
+)
+_aqclient = AsyncQdrantClient(
     url=os.getenv("QDRANT_DB_URL"),
     api_key=os.getenv("QDRANT_DB_KEY"),
 )
 
-if COLLECTION_NAME not in [c.name for c in qclient.get_collections().collections]:
-    qclient.create_collection(
+
+def get_dense_embedding() -> TextEmbedding:
+    return model_registry.get("dense")
+
+
+def get_sparse_embedding() -> SparseTextEmbedding:
+    return model_registry.get("sparse")
+
+
+def get_reranker() -> TextCrossEncoder:
+    return model_registry.get("reranker")
+
+
+def get_qdrant() -> QdrantClient:
+    return model_registry.get("qdrant")
+
+
+async def get_async_qdrant() -> AsyncQdrantClient:
+    await model_registry.aget("qdrant")
+    return _aqclient
+
+
+def get_vector_size() -> int:
+    """Dimension of the configured dense model, as reported by the model."""
+    return get_dense_embedding().embedding_size
+
+
+def _load_dense() -> TextEmbedding:
+    return TextEmbedding(
+        model_name=DENSE_MODEL_NAME,
+        cache_dir=str(CACHE_DIR),
+        threads=ONNX_THREADS,
+    )
+
+
+def _load_sparse() -> SparseTextEmbedding:
+    return SparseTextEmbedding(
+        model_name=SPARSE_MODEL_NAME,
+        cache_dir=str(CACHE_DIR),
+        threads=ONNX_THREADS,
+    )
+
+
+def _load_reranker() -> TextCrossEncoder:
+    return TextCrossEncoder(
+        model_name=RERANK_MODEL_NAME,
+        cache_dir=str(CACHE_DIR),
+        threads=ONNX_THREADS,
+    )
+
+
+def _connect_qdrant() -> QdrantClient:
+    """Create the collection if needed, retrying until Qdrant answers."""
+    size = get_vector_size()
+    delay = 1
+
+    while True:
+        try:
+            stored = _ensure_collection(size)
+            break
+        except (ResponseHandlingException, UnexpectedResponse) as e:
+            # anything else (auth, a malformed collection) won't fix itself
+            if not _is_unreachable(e):
+                raise
+            logging.warning(f"Qdrant not reachable, retrying in {delay}s: {e}")
+            time.sleep(delay)
+            delay = min(delay * 2, QDRANT_RETRY_MAX_SECONDS)
+
+    if stored != size:
+        raise RuntimeError(
+            f"collection {COLLECTION_NAME} holds {stored}-d vectors but "
+            f"{DENSE_MODEL_NAME} produces {size}-d, set QDRANT_COLLECTION "
+            "to a fresh collection for this model"
+        )
+
+    threading.Thread(
+        target=dedupe_index.warm,
+        args=(_qclient, COLLECTION_NAME),
+        name="dedupe-warm",
+        daemon=True,
+    ).start()
+
+    return _qclient
+
+
+def _is_unreachable(e: Exception) -> bool:
+    # no response at all, or a proxy in front of a Qdrant that isn't up yet
+    if isinstance(e, ResponseHandlingException):
+        return True
+    return e.status_code in (502, 503, 504)
+
+
+def _ensure_collection(size: int) -> int:
+    """Dense vector size of the collection, creating it with `size` if missing."""
+    if COLLECTION_NAME in [c.name for c in _qclient.get_collections().collections]:
+        vectors = _qclient.get_collection(COLLECTION_NAME).config.params.vectors
+        return vectors["text-dense"].size
+
+    _qclient.create_collection(
         collection_name=COLLECTION_NAME,
         vectors_config={
             "text-dense": VectorParams(
-                size=VECTOR_SIZE,
+                size=size,
                 distance=Distance.COSINE,
             ),
         },
@@ -60,20 +155,38 @@ if COLLECTION_NAME not in [c.name for c in qclient.get_collections().collections
             "text-sparse": SparseVectorParams(index=models.SparseIndexParams()),
         },
     )
-    qclient.create_payload_index(
+    _qclient.create_payload_index(
         collection_name=COLLECTION_NAME,
         field_name="_file_hash",
         field_schema=models.PayloadSchemaType.KEYWORD,
     )
-    qclient.create_payload_index(
+    _qclient.create_payload_index(
         collection_name=COLLECTION_NAME,
         field_name="_user_id",
         field_schema=models.PayloadSchemaType.KEYWORD,
     )
+    return size
+
+
+# one inference each, so ONNX session setup isn't paid by the first request
+model_registry.register(
+    "dense", _load_dense, warmup=lambda m: list(m.embed(["query: warm up"]))
+)
+model_registry.register(
+    "sparse", _load_sparse, warmup=lambda m: list(m.embed(["query: warm up"]))
+)
+model_registry.register(
+    "reranker", _load_reranker, warmup=lambda m: list(m.rerank("warm up", ["warm up"]))
+)
+model_registry.register("qdrant", _connect_qdrant)
 
 
 def document_exists(user_id: str, file_hash: str) -> bool:
-    results = qclient.scroll(
+    known = dedupe_index.lookup(user_id, file_hash)
+    if known is not None:
+        return known
+
+    results = get_qdrant().scroll(
         collection_name=COLLECTION_NAME,
         scroll_filter=models.Filter(
             must=[
@@ -90,7 +203,9 @@ def document_exists(user_id: str, file_hash: str) -> bool:
         limit=1,
     )
 
-    return len(results[0]) > 0
+    exists = len(results[0]) > 0
+    dedupe_index.record(user_id, file_hash, exists)
+    return exists
 
 
 
@@ -1,222 +1,485 @@
-from typing import List
+import hashlib
+import os
+from bisect import bisect_right
+from itertools import accumulate
+from typing import Iterable, Iterator, List
 import uuid
+import numpy as np
+import regex
 import tiktoken
+from src.common import metrics
+from src.common.lru import LRUCache
 from src.layers.chunking_embedding.models import Chunk
 from src.layers.data_extractor.models import ImagePage, TablePage
+from src.layers.structure_analyzer.analyzer import LayoutEvent
 from src.layers.structure_analyzer.models import Paragraph, Section, StructuredDocument
 
 _encoder = tiktoken.get_encoding("cl100k_base")
+# the encoder's pre-tokenizer; BPE never merges across its pieces
+_pieces = regex.compile(_encoder._pat_str)
+_NEWLINE_TOKEN = _encoder.encode("\n")[0]
 
-_token_cache = {}
 
+def _token_byte_lengths() -> np.ndarray:
+    lengths = np.zeros(_encoder.n_vocab, dtype=np.int64)
+    for token, rank in _encoder._mergeable_ranks.items():
+        lengths[rank] = len(token)
+    return lengths
 
-def count_tokens(text: str) -> int:
-    if text in _token_cache:
-        return _token_cache[text]
 
-    val = len(_encoder.encode(text))
-    _token_cache[text] = val
-    return val
+# lets one encoding of many rows be split back into the rows
+_token_lengths = _token_byte_lengths()
 
+# keyed by digest, so the cache never holds the counted text itself
+TOKEN_CACHE_MAX_BYTES = int(os.getenv("TOKEN_CACHE_MAX_BYTES") or 32 * 1024 * 1024)
+# measured: 16-byte digest, int and the LRU's per-entry overhead
+_TOKEN_CACHE_ENTRY_BYTES = 184
+_token_cache = LRUCache(max(1, TOKEN_CACHE_MAX_BYTES // _TOKEN_CACHE_ENTRY_BYTES))
 
-def chunk_document(
-    structured_document: StructuredDocument,
-    metadata: dict,
-    max_tokens: int = 450,
-    min_tokens: int = 80,
-) -> List[Chunk]:
 
-    chunks: List[Chunk] = []
+def _token_cache_stats() -> dict:
+    stats = _token_cache.stats()
+    stats["approx_bytes"] = stats["size"] * _TOKEN_CACHE_ENTRY_BYTES
+    stats["max_bytes"] = TOKEN_CACHE_MAX_BYTES
+    return stats
 
-    # ---- PREAMBLE ----
-    if structured_document.preamble:
-        preamble_text = "\n".join(p.text for p in structured_document.preamble)
-        if preamble_text.strip():
-            chunks.extend(
-                _chunk_paragraphs(
-                    paragraphs=structured_document.preamble,
-                    section_title="Preamble",
-                    section_path=["Preamble"],
-                    level=0,
-                    max_tokens=max_tokens,
-                    metadata=metadata,
-                )
-            )
 
-    # ---- SECTIONS ----
-    for section in structured_document.sections:
-        chunks.extend(
-            _process_section(
-                section,
-                parent_path=[],
-                max_tokens=max_tokens,
-                min_tokens=min_tokens,
-                metadata=metadata,
-            )
-        )
+metrics.register("token_cache", _token_cache_stats)
 
-    # ---- FINAL CLEANUP ----
-    chunks = _merge_small_chunks(chunks, min_tokens, max_tokens)
-    chunks = _deduplicate_chunks_atttach_index(chunks)
+# table rows are rendered and counted a block at a time
+TABLE_ROW_BLOCK = 2048
 
-    return chunks
+# fixed, so the same chunk gets the same point id in every process
+CHUNK_ID_NAMESPACE = uuid.UUID("5e0e0318-bd36-4b15-8840-23a5c95c76cc")
 
 
-def _chunk_paragraphs(
-    paragraphs,
-    section_title: str,
-    section_path: List[str],
-    level: int,
-    max_tokens: int,
-    metadata: dict,
-) -> List[Chunk]:
+def count_tokens(text: str) -> int:
+    key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
 
-    chunks: List[Chunk] = []
+    val = _token_cache.get(key)
+    if val is None:
+        val = len(_encoder.encode(text))
+        _token_cache.put(key, val)
+    return val
 
-    buffer = ""
-    page_start: int | None = None
-    page_end: int | None = None
 
-    for p in paragraphs:
-        text = p.text.strip()
-        if not text:
-            continue
+def _count_lines(lines: List[str], joined: bool = True) -> tuple[List[int], List[bool]]:
+    """
+    Token counts of `lines`, each ending in a newline, and whether each
+    line's last token is the newline on its own. Joined, they come from
+    a single encoding of the concatenation, which is cheaper and, since
+    nothing merges across a newline into a non-space, exact unless a
+    line starts with whitespace.
+    """
+    if not joined:
+        encoded = [_encoder.encode_ordinary(line) for line in lines]
+        return [len(t) for t in encoded], [t[-1:] == [_NEWLINE_TOKEN] for t in encoded]
+
+    tokens = np.array(_encoder.encode_ordinary("".join(lines)), dtype=np.int64)
+    token_ends = np.cumsum(_token_lengths[tokens])
+    line_ends = np.cumsum([len(line.encode("utf-8")) for line in lines])
+
+    bounds = np.searchsorted(token_ends, line_ends, side="right")
+    counts = np.diff(bounds, prepend=0)
+    bare_newline = (counts > 0) & (tokens[bounds - 1] == _NEWLINE_TOKEN)
+    return counts.tolist(), bare_newline.tolist()
+
+
+def _tail_piece(text: str) -> str:
+    """Last pre-tokenizer piece of `text`."""
+    # a newline followed by a non-space always ends a piece, so the
+    # scan can start there instead of at the top of a long text
+    start = text.rfind("\n") + 1
+    if start and text[start : start + 1].isspace():
+        start = 0
+
+    last = ""
+    for m in _pieces.finditer(text, start):
+        last = m.group()
+    return last
+
+
+def _join_cost(left: str, sep: str) -> int:
+    """
+    Tokens added by `sep` in `left + sep + right`, on top of the counts
+    of `left` and `right` on their own. Exact when `left` doesn't end in
+    whitespace, `sep` ends in a newline and `right` doesn't start with
+    whitespace: only the last piece of `left` can merge with `sep`, and
+    nothing merges across the newline into `right`.
+    """
+    tail = _tail_piece(left)
+    return count_tokens(tail + sep) - count_tokens(tail)
+
+
+def chunk_point_id(user_id: str, file_hash: str, chunk_index: int) -> str:
+    """Qdrant point id of the `chunk_index`-th chunk of a user's document."""
+    return str(
+        uuid.uuid5(CHUNK_ID_NAMESPACE, f"{user_id}\x00{file_hash}\x00{chunk_index}")
+    )
 
-        if page_start is None:
-            page_start = p.page_number
 
-        page_end = p.page_number
+def chunk_document(
+    structured_document: StructuredDocument,
+    metadata: dict,
+    max_tokens: int = 450,
+    min_tokens: int = 80,
+) -> List[Chunk]:
 
-        candidate = f"{buffer}\n{text}" if buffer else text
-        token_count = count_tokens(candidate)
+    return list(
+        iter_chunks(
+            _document_events(structured_document),
+            metadata,
+            max_tokens=max_tokens,
+            min_tokens=min_tokens,
+        )
+    )
 
-        if token_count <= max_tokens:
-            buffer = candidate
-        else:
-            # flush
-            if buffer:
-                chunks.append(
-                    _build_chunk(
-                        buffer,
-                        section_title,
-                        section_path,
-                        level,
-                        page_start,
-                        page_end,
-                        metadata=metadata,
-                    )
-                )
 
-            buffer = text
-            page_start = p.page_number
-            page_end = p.page_number
+def iter_chunks(
+    layout_events: Iterable[LayoutEvent],
+    metadata: dict,
+    max_tokens: int = 450,
+    min_tokens: int = 80,
+) -> Iterator[Chunk]:
+    """
+    Streaming counterpart of chunk_document: consumes layout events
+    (see structure_analyzer.iter_layout) and yields final chunks as soon
+    as the paragraphs, tables and merges that produce them are closed.
+    """
 
-    # final flush
-    if buffer:
-        chunks.append(
-            _build_chunk(
-                buffer,
-                section_title,
-                section_path,
-                level,
-                page_start,
-                page_end,
-                metadata=metadata,
-            )
-        )
+    chunks = _chunk_events(layout_events, metadata, max_tokens)
+
+    # ---- FINAL CLEANUP ----
+    chunks = _merge_small_chunks(chunks, min_tokens, max_tokens)
+    return _deduplicate_chunks_atttach_index(chunks)
 
-    return chunks
 
+def _document_events(structured_document: StructuredDocument) -> Iterator[LayoutEvent]:
 
-def _process_section(section, parent_path, max_tokens, min_tokens, metadata):
+    # ---- PREAMBLE ----
+    for paragraph in structured_document.preamble:
+        yield "paragraph", paragraph, []
 
-    path = parent_path + [section.title]
-    chunks = []
+    # ---- SECTIONS ----
+    for section in structured_document.sections:
+        yield from _section_events(section, [])
 
-    paragraph_buffer = []
 
-    def flush_paragraph_buffer():
-        nonlocal paragraph_buffer, chunks
+def _section_events(section: Section, parents: List[Section]) -> Iterator[LayoutEvent]:
 
-        if paragraph_buffer:
-            chunks.extend(
-                _chunk_paragraphs(
-                    paragraph_buffer,
-                    section.title,
-                    path,
-                    section.level,
-                    max_tokens,
-                    metadata,
-                )
-            )
-            paragraph_buffer = []
+    yield "section", section, parents
+
+    sections = parents + [section]
 
     for item in section.content_stream:
         if isinstance(item, Paragraph):
-            paragraph_buffer.append(item)
+            yield "paragraph", item, sections
 
         elif isinstance(item, TablePage):
-            flush_paragraph_buffer()
-            chunks.extend(_build_table_chunk(item, section, path, metadata))
+            yield "table", item, sections
 
         elif isinstance(item, Section):
-            flush_paragraph_buffer()
-            chunks.extend(
-                _process_section(item, path, max_tokens, min_tokens, metadata)
-            )
+            yield from _section_events(item, sections)
 
         elif isinstance(item, ImagePage):
-            flush_paragraph_buffer()
-            continue
+            yield "image", item, sections
 
-    return chunks
 
+def _chunk_events(
+    layout_events: Iterable[LayoutEvent],
+    metadata: dict,
+    max_tokens: int,
+) -> Iterator[Chunk]:
+
+    run: _ParagraphRun | None = None
+    table_run: _TableRun | None = None
+
+    for kind, item, sections in layout_events:
+        owner = sections[-1] if sections else None
+
+        # the next window of the same table continues its run; anything
+        # else closes it
+        if table_run is not None and not (
+            kind == "table" and table_run.continues(item, owner)
+        ):
+            yield from table_run.flush()
+            table_run = None
+
+        if kind == "paragraph":
+            if run is not None and run.owner is not owner:
+                yield from run.flush()
+                run = None
+
+            if run is None:
+                if owner is None:
+                    run = _ParagraphRun(
+                        None, "Preamble", ["Preamble"], 0, max_tokens, metadata
+                    )
+                else:
+                    run = _ParagraphRun(
+                        owner,
+                        owner.title,
+                        [s.title for s in sections],
+                        owner.level,
+                        max_tokens,
+                        metadata,
+                    )
 
-def _build_table_chunk(table, section, section_path, metadata):
+            yield from run.add(item)
+            continue
 
-    table_metadata = metadata.copy()
-    table_metadata["_content_type"] = "table"
+        # tables, images and new sections all close the paragraph run
+        if run is not None:
+            yield from run.flush()
+            run = None
 
-    headers = table.data[0]
-    rows = table.data[1:]
+        if kind == "table" and owner is not None and item.data:
+            if table_run is None:
+                table_run = _TableRun(
+                    item, owner, [s.title for s in sections], max_tokens, metadata
+                )
+            yield from table_run.add_table(item)
 
-    max_rows_per_chunk = 20
+    # final flush
+    if run is not None:
+        yield from run.flush()
+    if table_run is not None:
+        yield from table_run.flush()
+
+
+class _ParagraphRun:
+    """Greedily packs consecutive paragraphs of one section into chunks."""
+
+    def __init__(
+        self,
+        owner: Section | None,
+        section_title: str,
+        section_path: List[str],
+        level: int,
+        max_tokens: int,
+        metadata: dict,
+    ):
+        self.owner = owner
+        self.section_title = section_title
+        self.section_path = section_path
+        self.level = level
+        self.max_tokens = max_tokens
+        self.metadata = metadata
+
+        self.buffer = ""
+        self.tokens = 0
+        self.join_tokens = 0  # cost of "\n" after the buffer's last paragraph
+        self.page_start: int | None = None
+        self.page_end: int | None = None
+
+    def add(self, p: Paragraph) -> Iterator[Chunk]:
+        text = p.text.strip()
+        if not text:
+            return
 
-    chunks = []
+        if self.page_start is None:
+            self.page_start = p.page_number
 
-    for i in range(0, len(rows), max_rows_per_chunk):
-        group = rows[i : i + max_rows_per_chunk]
+        self.page_end = p.page_number
 
-        # Natural language version
-        text_lines = []
-        for row in group:
-            row_text = ", ".join(f"{headers[j]}: {row[j]}" for j in range(len(headers)))
-            text_lines.append(row_text)
+        # counted once per paragraph; the buffer's size is tracked additively
+        text_tokens = count_tokens(text)
+        if self.buffer:
+            candidate = f"{self.buffer}\n{text}"
+            token_count = self.tokens + self.join_tokens + text_tokens
+        else:
+            candidate = text
+            token_count = text_tokens
+
+        if token_count <= self.max_tokens:
+            self.buffer = candidate
+            self.tokens = token_count
+            self.join_tokens = _join_cost(text, "\n")
+            return
+
+        # flush
+        if self.buffer:
+            yield self._build()
+
+        self.buffer = text
+        self.tokens = text_tokens
+        self.join_tokens = _join_cost(text, "\n")
+        self.page_start = p.page_number
+        self.page_end = p.page_number
+
+    def flush(self) -> Iterator[Chunk]:
+        if self.buffer:
+            yield self._build()
+            self.buffer = ""
+            self.tokens = 0
+
+    def _build(self) -> Chunk:
+        return _build_chunk(
+            self.buffer,
+            self.section_title,
+            self.section_path,
+            self.level,
+            self.page_start,
+            self.page_end,
+            metadata=self.metadata,
+            token_count=self.tokens,
+        )
 
-        text = "Table:\n" + "\n".join(text_lines)
 
-        chunk = Chunk(
+def _row_format(headers: list) -> str:
+    """Format string rendering a row as "header: value, ...", newline included."""
+    fields = (str(h).replace("{", "{{").replace("}", "}}") for h in headers)
+    return ", ".join(f"{h}: {{}}" for h in fields) + "\n"
+
+
+class _TableRun:
+    """
+    Greedily packs consecutive rows of one table, across all of its
+    windows, into chunks of up to `max_tokens`; a row over the budget on
+    its own gets its own chunk.
+
+    A newline followed by a non-space always ends a pre-tokenizer piece,
+    so a chunk's count is the prefix's plus each row line's, newline
+    included, except for the last row, whose newline is dropped.
+    """
+
+    prefix = "Table:\n"
+
+    def __init__(
+        self,
+        table: TablePage,
+        section: Section,
+        section_path: List[str],
+        max_tokens: int,
+        metadata: dict,
+    ):
+        self.table = table
+        self.section = section
+        self.section_path = section_path
+        self.headers = table.data[0]
+        self.max_tokens = max_tokens
+        self.metadata = metadata | {"_content_type": "table"}
+
+        self.line_format = _row_format(self.headers)
+        # every line starts with the first header; one starting with
+        # whitespace can share a piece with the newline before it
+        self.exact = not self.line_format[:1].isspace()
+        # appended to every row, so short rows render their missing cells as None
+        self.missing = [None] * len(self.headers)
+
+        self.prefix_tokens = count_tokens(self.prefix)
+        self.row_start = table.row_offset
+        self.rows: list = []
+        self.lines: List[str] = []
+        self.tokens = self.prefix_tokens
+        # (count, ends in a bare newline) of the last two rows, so the
+        # last one can be taken back
+        self.previous = (0, False)
+        self.last = (0, False)
+
+    def continues(self, table: TablePage, section: Section | None) -> bool:
+        return table.id == self.table.id and section is self.section
+
+    def add_table(self, table: TablePage) -> Iterator[Chunk]:
+        rows = table.data[1:]
+
+        for i in range(0, len(rows), TABLE_ROW_BLOCK):
+            block = rows[i : i + TABLE_ROW_BLOCK]
+            lines = [self.line_format.format(*row, *self.missing) for row in block]
+            counts, bare_newlines = _count_lines(lines, joined=self.exact)
+            yield from self._add_block(block, lines, counts, bare_newlines)
+
+    def _add_block(
+        self,
+        rows: list,
+        lines: List[str],
+        counts: List[int],
+        bare_newlines: List[bool],
+    ) -> Iterator[Chunk]:
+        """Packs a chunk at a time: only the row that overflows is looked at on its own."""
+        # ends[k]: tokens of lines[: k + 1]
+        ends = list(accumulate(counts))
+        start = 0
+
+        while start < len(rows):
+            done = ends[start - 1] if start else 0
+            # the rows that still fit with their newlines
+            stop = bisect_right(ends, done + self.max_tokens - self.tokens, start)
+            if stop == start and not self.lines:
+                # over the budget on its own
+                stop += 1
+
+            if stop > start:
+                self.rows.extend(rows[start:stop])
+                self.lines.extend(lines[start:stop])
+                self.tokens += ends[stop - 1] - done
+                self.last = (counts[stop - 1], bare_newlines[stop - 1])
+                start = stop
+            if start == len(rows):
+                return
+
+            # may still fit as the last row, without its newline
+            self._append(rows[start], lines[start], counts[start], bare_newlines[start])
+            if self._closing_tokens() <= self.max_tokens:
+                start += 1
+            else:
+                self._pop()
+            yield from self.flush()
+
+    def flush(self) -> Iterator[Chunk]:
+        if self.lines:
+            yield self._build(self._closing_tokens())
+            self._reset()
+
+    def _closing_tokens(self) -> int:
+        """Count of the chunk as it stands, the last row's newline dropped."""
+        tokens, bare_newline = self.last
+        if bare_newline:
+            # a newline encoded on its own left the rest of the row unchanged
+            return self.tokens - 1
+        return self.tokens - tokens + count_tokens(self.lines[-1][:-1])
+
+    def _append(self, row: list, line: str, tokens: int, bare_newline: bool) -> None:
+        self.rows.append(row)
+        self.lines.append(line)
+        self.tokens += tokens
+        self.previous, self.last = self.last, (tokens, bare_newline)
+
+    def _pop(self) -> None:
+        self.rows.pop()
+        self.lines.pop()
+        self.tokens -= self.last[0]
+        self.last = self.previous
+
+    def _reset(self) -> None:
+        self.row_start += len(self.rows)
+        self.rows = []
+        self.lines = []
+        self.tokens = self.prefix_tokens
+
+    def _build(self, token_count: int) -> Chunk:
+        text = self.prefix + "".join(self.lines)[:-1]
+        if not self.exact:
+            token_count = count_tokens(text)
+
+        return Chunk(
             id=str(uuid.uuid4()),
             text=text,
-            token_count=count_tokens(text),
-            section_title=section.title,
-            section_path=section_path,
-            level=section.level,
-            page_start=table.page_number,
-            page_end=table.page_number,
+            token_count=token_count,
+            section_title=self.section.title,
+            section_path=self.section_path,
+            level=self.section.level,
+            page_start=self.table.page_number,
+            page_end=self.table.page_number,
             metadata={
-                **table_metadata,
-                "_table_headers": headers,
-                "_row_start": i,
-                "_row_end": i + len(group) - 1,
-                "_table_json": group,
+                **self.metadata,
+                "_table_headers": self.headers,
+                "_row_start": self.row_start,
+                "_row_end": self.row_start + len(self.rows) - 1,
+                "_table_json": self.rows,
             },
         )
 
-        chunks.append(chunk)
-
-    return chunks
-
 
 def _build_chunk(
     text: str,
@@ -226,12 +489,13 @@ def _build_chunk(
     page_start: int | None,
     page_end: int | None,
     metadata: dict,
+    token_count: int | None = None,
 ) -> Chunk:
 
     return Chunk(
         id=str(uuid.uuid4()),
         text=text.strip(),
-        token_count=count_tokens(text),
+        token_count=count_tokens(text) if token_count is None else token_count,
         section_title=section_title,
         section_path=section_path,
         level=level,
@@ -242,32 +506,37 @@ def _build_chunk(
 
 
 def _merge_small_chunks(
-    chunks: List[Chunk],
+    chunks: Iterable[Chunk],
     min_tokens: int,
     max_tokens: int,
-) -> List[Chunk]:
+) -> Iterator[Chunk]:
 
-    if not chunks:
-        return []
-
-    merged: List[Chunk] = []
+    prev: Chunk | None = None
+    # whether prev.token_count is the count of prev.text itself; a merged
+    # chunk counts its unstripped text, which can differ
+    prev_exact = True
 
     for chunk in chunks:
-        if not merged:
-            merged.append(chunk)
+        if prev is None:
+            prev = chunk
             continue
 
-        prev = merged[-1]
-
         # Merge if either side is small
         if prev.token_count < min_tokens or chunk.token_count < min_tokens:
-            combined_text = (
-                prev.text + "." + "\n" + chunk.section_path[-1] + ":\n" + chunk.text
-            )
-            combined_tokens = count_tokens(combined_text)
+            sep = "." + "\n" + chunk.section_path[-1] + ":\n"
+            combined_text = prev.text + sep + chunk.text
+
+            if prev_exact and not (
+                prev.text[-1:].isspace() or chunk.text[:1].isspace()
+            ):
+                combined_tokens = (
+                    prev.token_count + _join_cost(prev.text, sep) + chunk.token_count
+                )
+            else:
+                combined_tokens = count_tokens(combined_text)
 
             if combined_tokens <= max_tokens:
-                merged[-1] = _build_chunk(
+                prev = _build_chunk(
                     combined_text,
                     prev.section_title,
                     # combine section paths
@@ -277,28 +546,40 @@ def _merge_small_chunks(
                     prev.page_start,
                     chunk.page_end,
                     prev.metadata,
+                    token_count=combined_tokens,
                 )
+                prev_exact = combined_text == prev.text
                 continue
 
-        merged.append(chunk)
+        yield prev
+        prev = chunk
+        prev_exact = True
 
-    return merged
+    if prev is not None:
+        yield prev
 
 
-def _deduplicate_chunks_atttach_index(chunks: List[Chunk]) -> List[Chunk]:
+def _deduplicate_chunks_atttach_index(chunks: Iterable[Chunk]) -> Iterator[Chunk]:
+    # digests rather than texts, so a long stream doesn't pin every chunk
     seen = set()
-    unique = []
     index = 0
 
     for chunk in chunks:
-        normalized = chunk.text.strip()
+        normalized = hashlib.blake2b(
+            chunk.text.strip().encode("utf-8"), digest_size=16
+        ).digest()
 
         if normalized in seen:
             continue
 
         seen.add(normalized)
         chunk.chunk_index = index
-        index += 1
-        unique.append(chunk)
 
-    return unique
+        user_id = chunk.metadata.get("_user_id")
+        file_hash = chunk.metadata.get("_file_hash")
+        if user_id is not None and file_hash is not None:
+            # re-ingesting a document overwrites its points instead of duplicating them
+            chunk.id = chunk_point_id(user_id, file_hash, index)
+
+        index += 1
+        yield chunk
@@ -1,44 +1,67 @@
-from concurrent.futures import ThreadPoolExecutor
-import os
 from typing import List
 from qdrant_client.models import models
+from src.layers.chunking_embedding.embedding_cache import embedding_cache
 from src.layers.chunking_embedding.models import Chunk
-from src.common.utils import dense_embedding, sparse_embedding
+from src.common.inference import INGEST, inference
+from src.common.utils import (
+    DENSE_MODEL,
+    DENSE_MODEL_NAME,
+    SPARSE_MODEL_NAME,
+    get_dense_embedding,
+    get_sparse_embedding,
+)
 
-
-_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 4)
+# texts per scheduled model call; small enough that queries queued
+# behind ingestion don't wait for a whole batch
+INGEST_CALL_SIZE = 16
 
 
 def embed_chunks(chunks: List[Chunk], batch_size: int = 64) -> List[Chunk]:
     for i in range(0, len(chunks), batch_size):
         batch = chunks[i : i + batch_size]
 
-        texts = []
+        sparse_texts = []
+        dense_texts = []
         for c in batch:
             path = " > ".join(c.section_path) if c.section_path else ""
             title = c.section_title or ""
 
-            text = f"""passage:
-Title: {title}
+            body = f"""Title: {title}
 Path: {path}
 File Name : {c.metadata["_source_file"]}
 page: {c.page_start} - {c.page_end}
 
 {c.text.strip()}
 """
-            texts.append(text)
+            # the sparse model always sees the e5 style prefix it was indexed with
+            sparse_texts.append(f"passage:\n{body}")
+            dense_texts.append(f"{DENSE_MODEL.passage_prefix}{body}")
+
+        if embedding_cache is not None:
+            dense_vectors = embedding_cache.get_dense(DENSE_MODEL_NAME, dense_texts)
+            sparse_vectors = embedding_cache.get_sparse(SPARSE_MODEL_NAME, sparse_texts)
+        else:
+            dense_vectors = [None] * len(batch)
+            sparse_vectors = [None] * len(batch)
 
-        def dense_task():
-            return list(dense_embedding.embed(texts))
+        # only text the cache hasn't seen goes through the models
+        dense_missing = [t for t, v in zip(dense_texts, dense_vectors) if v is None]
+        sparse_missing = [t for t, v in zip(sparse_texts, sparse_vectors) if v is None]
 
-        def sparse_task():
-            return list(sparse_embedding.embed(texts))
+        dense_futures = _schedule(_embed_dense, dense_missing)
+        sparse_futures = _schedule(_embed_sparse, sparse_missing)
 
-        future_dense = _executor.submit(dense_task)
-        future_sparse = _executor.submit(sparse_task)
+        if dense_futures:
+            fresh = [v for f in dense_futures for v in f.result()]
+            _fill(dense_vectors, fresh)
+            if embedding_cache is not None:
+                embedding_cache.put_dense(DENSE_MODEL_NAME, dense_missing, fresh)
 
-        dense_vectors = future_dense.result()
-        sparse_vectors = future_sparse.result()
+        if sparse_futures:
+            fresh = [v for f in sparse_futures for v in f.result()]
+            _fill(sparse_vectors, fresh)
+            if embedding_cache is not None:
+                embedding_cache.put_sparse(SPARSE_MODEL_NAME, sparse_missing, fresh)
 
         for chunk, dv, sv in zip(batch, dense_vectors, sparse_vectors):
             chunk.dense_vectors = dv.tolist()
@@ -48,3 +71,25 @@ page: {c.page_start} - {c.page_end}
             )
 
     return chunks
+
+
+def _schedule(embed, texts: List[str]) -> list:
+    return [
+        inference.submit(INGEST, embed, texts[i : i + INGEST_CALL_SIZE])
+        for i in range(0, len(texts), INGEST_CALL_SIZE)
+    ]
+
+
+def _embed_dense(texts: List[str]) -> list:
+    return list(get_dense_embedding().embed(texts))
+
+
+def _embed_sparse(texts: List[str]) -> list:
+    return list(get_sparse_embedding().embed(texts))
+
+
+def _fill(slots: list, fresh: list) -> None:
+    it = iter(fresh)
+    for i, v in enumerate(slots):
+        if v is None:
+            slots[i] = next(it)
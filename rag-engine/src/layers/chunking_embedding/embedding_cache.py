@@ -0,0 +1,197 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+from fastembed import SparseEmbedding
+
+from src.common import metrics
+
+# ===============================
+# CONFIG
+# ===============================
+CACHE_PATH = Path(os.getenv("EMBED_CACHE_PATH") or "./models_cache/embeddings.sqlite3")
+MAX_CACHE_BYTES = int(os.getenv("EMBED_CACHE_MAX_BYTES") or 2 * 1024**3)
+EVICT_TO = 0.9  # evict down to this fraction of MAX_CACHE_BYTES
+
+
+class EmbeddingCache:
+    """
+    Disk-backed vectors keyed by (model id, sha256 of the exact text fed
+    to the model). Dense vectors are stored as raw float32, sparse ones as
+    int32 indices followed by float32 values. The least recently used
+    rows are evicted once the stored bytes pass `max_bytes`.
+    """
+
+    def __init__(self, path: Path = CACHE_PATH, max_bytes: int = MAX_CACHE_BYTES):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS vectors (
+                key BLOB PRIMARY KEY,
+                data BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS vectors_last_used ON vectors(last_used)"
+        )
+        self._lock = threading.Lock()
+        self._max_bytes = max_bytes
+        self._bytes = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM vectors"
+        ).fetchone()[0]
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # ---------- dense ----------
+    def get_dense(self, model: str, texts: List[str]) -> List[np.ndarray | None]:
+        return [
+            None if data is None else np.frombuffer(data, dtype=np.float32)
+            for data in self._get(model, texts)
+        ]
+
+    def put_dense(self, model: str, texts: List[str], vectors) -> None:
+        self._put(
+            model,
+            texts,
+            [np.asarray(v, dtype=np.float32).tobytes() for v in vectors],
+        )
+
+    # ---------- sparse ----------
+    def get_sparse(self, model: str, texts: List[str]) -> List[SparseEmbedding | None]:
+        return [
+            None if data is None else _unpack_sparse(data)
+            for data in self._get(model, texts)
+        ]
+
+    def put_sparse(self, model: str, texts: List[str], vectors) -> None:
+        self._put(model, texts, [_pack_sparse(v) for v in vectors])
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "bytes": self._bytes,
+                "max_bytes": self._max_bytes,
+                "evictions": self.evictions,
+            }
+
+    def _get(self, model: str, texts: List[str]) -> List[bytes | None]:
+        keys = [_key(model, t) for t in texts]
+        if not keys:
+            return []
+
+        with self._lock:
+            rows = dict(
+                self._db.execute(
+                    f"SELECT key, data FROM vectors WHERE key IN ({','.join('?' * len(keys))})",
+                    keys,
+                ).fetchall()
+            )
+
+            if rows:
+                self._db.execute(
+                    f"UPDATE vectors SET last_used = ? WHERE key IN ({','.join('?' * len(rows))})",
+                    [time.time(), *rows],
+                )
+                self._db.commit()
+
+            found = [rows.get(k) for k in keys]
+            hits = sum(1 for data in found if data is not None)
+            self.hits += hits
+            self.misses += len(keys) - hits
+
+        return found
+
+    def _put(self, model: str, texts: List[str], blobs: List[bytes]) -> None:
+        if not blobs:
+            return
+
+        now = time.time()
+        rows = [
+            (_key(model, t), blob, len(blob), now) for t, blob in zip(texts, blobs)
+        ]
+
+        with self._lock:
+            for key, blob, size, used in rows:
+                previous = self._db.execute(
+                    "SELECT size FROM vectors WHERE key = ?", (key,)
+                ).fetchone()
+                self._db.execute(
+                    "INSERT OR REPLACE INTO vectors VALUES (?, ?, ?, ?)",
+                    (key, blob, size, used),
+                )
+                self._bytes += size - (previous[0] if previous else 0)
+
+            if self._bytes > self._max_bytes:
+                self._evict()
+
+            self._db.commit()
+
+    def _evict(self) -> None:
+        target = self._max_bytes * EVICT_TO
+
+        while self._bytes > target:
+            victims = self._db.execute(
+                "SELECT key, size FROM vectors ORDER BY last_used LIMIT 1000"
+            ).fetchall()
+            if not victims:
+                self._bytes = 0
+                break
+
+            doomed = []
+            for key, size in victims:
+                if self._bytes <= target:
+                    break
+                doomed.append((key,))
+                self._bytes -= size
+
+            self._db.executemany("DELETE FROM vectors WHERE key = ?", doomed)
+            self.evictions += len(doomed)
+
+
+def _key(model: str, text: str) -> bytes:
+    return hashlib.sha256(f"{model}\x00{text}".encode("utf-8")).digest()
+
+
+def _pack_sparse(vector) -> bytes:
+    indices = np.asarray(vector.indices, dtype=np.int32)
+    values = np.asarray(vector.values, dtype=np.float32)
+    return np.int32(len(indices)).tobytes() + indices.tobytes() + values.tobytes()
+
+
+def _unpack_sparse(data: bytes) -> SparseEmbedding:
+    n = int(np.frombuffer(data, dtype=np.int32, count=1)[0])
+    indices = np.frombuffer(data, dtype=np.int32, count=n, offset=4)
+    values = np.frombuffer(data, dtype=np.float32, count=n, offset=4 + 4 * n)
+    return SparseEmbedding(values=values, indices=indices)
+
+
+def _open_cache() -> EmbeddingCache | None:
+    if MAX_CACHE_BYTES <= 0:
+        return None
+
+    try:
+        return EmbeddingCache()
+    except sqlite3.Error as e:
+        logging.error(f"embedding cache disabled, could not open {CACHE_PATH}: {e}")
+        return None
+
+
+embedding_cache = _open_cache()
+if embedding_cache is not None:
+    metrics.register("embedding_cache", embedding_cache.stats)
@@ -1,54 +1,128 @@
 import csv
 import io
 import uuid
+from itertools import islice
+from typing import Iterator
+
 from src.layers.data_extractor.models import Line, Page, TablePage
 
 
+# ===============================
+# CONFIG
+# ===============================
+CSV_WINDOW_ROWS = 256  # rows per table window handed down the pipeline
+CSV_PREVIEW_ROWS = 50  # rows also rendered as text lines, for layout + headings
+LINE_GAP = 14.0
+
+
 def extract_data_csv(csv_bytes: bytes) -> tuple[list[Page], dict]:
-    metadata: dict[str, object] = {
-        "_file_type": "csv",
-        "_page_count": 1,
-    }
+    rows = iter_csv_rows(csv_bytes)
+    header = next(rows)
+    body = list(rows)
 
-    text = csv_bytes.decode("utf-8", errors="replace")
+    metadata = _metadata(header)
+    metadata["_csv_row_count"] = len(body)
 
-    lines, tables = _parse_csv(text, metadata)
+    return [_first_page(header, body, str(uuid.uuid4()))], metadata
 
-    page = Page(
-        page_number=1,
-        text="\n".join(line.text for line in lines),
-        lines=lines,
-        tables=tables,
-        images=[],
-        width=None,
-        height=None,
-    )
 
-    return [page], metadata
+def stream_data_csv(csv_bytes: bytes) -> tuple[Iterator[Page], dict]:
+    """
+    Parse the CSV lazily: the first page carries the title, the preview
+    lines and the first window of rows, and every following page one more
+    window of the same table. Rows are validated as they are read, so a
+    malformed file fails the ingestion part way through. The row count
+    is only known at the end, so it is added to the metadata once the
+    last page has been read.
+    """
+    source = io.BytesIO(csv_bytes)
+    rows = _read_rows(source)
+    header = next(rows)
+    metadata = _metadata(header)
+
+    return _iter_pages(header, rows, source, metadata), metadata
 
 
-def _parse_csv(
-    csv_text: str,
+def iter_csv_rows(csv_bytes: bytes) -> Iterator[list[str]]:
+    """
+    Decode and parse the CSV incrementally, header row first. Raises
+    ValueError as soon as the file turns out not to be UTF-8, is empty,
+    or has a row whose column count differs from the header's.
+    """
+    return _read_rows(io.BytesIO(csv_bytes))
+
+
+def _read_rows(source: io.BytesIO) -> Iterator[list[str]]:
+    text = io.TextIOWrapper(source, encoding="utf-8", newline="")
+    reader = csv.reader(text)
+
+    try:
+        header = next(reader, None)
+        if header is None:
+            raise ValueError("Empty CSV")
+
+        yield header
+
+        for row in reader:
+            if len(row) != len(header):
+                raise ValueError(f"Malformed CSV: line {reader.line_num}")
+            yield row
+
+    except UnicodeDecodeError:
+        raise ValueError("CSV must be UTF-8 text")
+    except csv.Error as e:
+        raise ValueError(f"Malformed CSV: {e}")
+    finally:
+        # closing the wrapper would close the source, whose position
+        # the pages report
+        text.detach()
+
+
+def _metadata(header: list[str]) -> dict[str, object]:
+    return {
+        "_file_type": "csv",
+        "_page_count": 1,
+        "_csv_columns": header,
+    }
+
+
+def _iter_pages(
+    header: list[str],
+    rows: Iterator[list[str]],
+    source: io.BytesIO,
     metadata: dict[str, object],
-) -> tuple[list[Line], list[TablePage]]:
+) -> Iterator[Page]:
+    table_id = str(uuid.uuid4())
 
-    reader = csv.reader(io.StringIO(csv_text))
-    rows = list(reader)
+    window = list(islice(rows, CSV_WINDOW_ROWS))
+    yield _first_page(header, window, table_id, source.tell())
 
-    if not rows:
-        return [], []
+    offset = len(window)
+    while window := list(islice(rows, CSV_WINDOW_ROWS)):
+        yield Page(
+            page_number=1,
+            text="",
+            lines=[],
+            tables=[_table(table_id, header, window, offset, 0.0)],
+            images=[],
+            width=None,
+            height=None,
+            source_offset=source.tell(),
+        )
+        offset += len(window)
 
-    header = rows[0]
-    body = rows[1:]
+    metadata["_csv_row_count"] = offset
 
-    metadata["_csv_columns"] = header
-    metadata["_csv_row_count"] = len(body)
 
+def _first_page(
+    header: list[str],
+    body: list[list[str]],
+    table_id: str,
+    source_offset: int | None = None,
+) -> Page:
     lines: list[Line] = []
-    tables: list[TablePage] = []
 
     y = 0.0
-    line_gap = 14.0
 
     # ---------- Optional title line ----------
     lines.append(
@@ -63,29 +137,10 @@ def _parse_csv(
             bottom=y + 22,
         )
     )
-    y += line_gap * 2
-
-    # ---------- Table ----------
-    data: list[list[str | None]] = [[c if c != "" else None for c in header]]
-
-    for row in body:
-        data.append([c if c != "" else None for c in row])
-
-    tables.append(
-        TablePage(
-            id=str(uuid.uuid4()),
-            bbox=(0, y, 0, y),
-            data=data,
-            top=y,
-            x0=0,
-            x1=800,
-            bottom=y,
-            page_number=1,
-        )
-    )
+    y += LINE_GAP * 2
 
     # ---------- Text lines (for layout + headings) ----------
-    for _, row in enumerate(body[:50]):  # cap for readability
+    for row in body[:CSV_PREVIEW_ROWS]:  # cap for readability
         text = ", ".join(f"{header[i]}: {row[i]}" for i in range(len(header)))
         lines.append(
             Line(
@@ -99,6 +154,42 @@ def _parse_csv(
                 bottom=y + 12,
             )
         )
-        y += line_gap
+        y += LINE_GAP
 
-    return lines, tables
+    # ---------- Table ----------
+    # below the text, so later windows follow it directly in reading order
+    return Page(
+        page_number=1,
+        text="\n".join(line.text for line in lines),
+        lines=lines,
+        tables=[_table(table_id, header, body, 0, y)],
+        images=[],
+        width=None,
+        height=None,
+        source_offset=source_offset,
+    )
+
+
+def _table(
+    table_id: str,
+    header: list[str],
+    rows: list[list[str]],
+    offset: int,
+    y: float,
+) -> TablePage:
+    data: list[list[str | None]] = [[c if c != "" else None for c in header]]
+
+    for row in rows:
+        data.append([c if c != "" else None for c in row])
+
+    return TablePage(
+        id=table_id,
+        bbox=(0, y, 0, y),
+        data=data,
+        top=y,
+        x0=0,
+        x1=800,
+        bottom=y,
+        page_number=1,
+        row_offset=offset,
+    )
@@ -1,120 +1,338 @@
-import json
+import io
 import uuid
+from typing import Iterator
+
+import ijson
+
 from src.layers.data_extractor.models import Line, Page, TablePage
 
 
+# ===============================
+# CONFIG
+# ===============================
+JSON_WINDOW_ROWS = 256  # records per table window handed down the pipeline
+JSON_PAGE_LINES = 256  # heading lines and table rows collected before a page is emitted
+
+
 def extract_data_json(json_bytes: bytes) -> tuple[list[Page], dict]:
+    pages, metadata = stream_data_json(json_bytes)
+    return list(pages), metadata
+
+
+def stream_data_json(json_bytes: bytes) -> tuple[Iterator[Page], dict]:
+    """
+    Walk the document from parser events, with an explicit stack instead
+    of recursion, so neither size nor depth is bounded by memory or the
+    recursion limit. Keys become heading lines sized by depth, so sections
+    nest; scalars become (key, value) rows of a table under the heading
+    of their object or array, and arrays of objects tables whose records
+    are streamed in windows.
+    """
     metadata: dict[str, object] = {
         "_file_type": "json",
         "_page_count": 1,
     }
 
-    text = json_bytes.decode("utf-8", errors="replace")
-    data = json.loads(text)
-
-    lines: list[Line] = []
-    tables: list[TablePage] = []
-
-    y = 0.0
-
-    _walk_json(
-        data=data,
-        path=[],
-        lines=lines,
-        tables=tables,
-        y_ref=[y],
-        page_number=1,
-    )
-
-    page = Page(
-        page_number=1,
-        text="\n".join(lin.text for lin in lines),
-        lines=lines,
-        tables=tables,
-        images=[],
-        width=None,
-        height=None,
-    )
-
-    return [page], metadata
-
-
-def _walk_json(
-    data,
-    path: list[str],
-    lines: list[Line],
-    tables: list[TablePage],
-    y_ref: list[float],
-    page_number: int,
-):
-    y = y_ref[0]
-
-    # ---------- dict ----------
-    if isinstance(data, dict):
-        for key, value in data.items():  # 🔒 insertion order preserved
-            title = ".".join(path + [str(key)])
-
-            lines.append(
-                Line(
-                    text=title,
-                    words=[],
-                    top=y,
-                    avg_size=18,
-                    is_bold=True,
-                    x0=len(path) * 20,
-                    x1=800,
-                    bottom=y + 18,
-                )
-            )
-            y += 18
+    source = io.BytesIO(json_bytes)
+    return _iter_pages(_read_events(source), source), metadata
 
-            _walk_json(value, path + [str(key)], lines, tables, [y], page_number)
-            y = y_ref[0]
 
-    # ---------- list ----------
-    elif isinstance(data, list):
-        if data and all(isinstance(x, dict) for x in data):
-            # table-like list
-            headers = list(data[0].keys())
-
-            rows: list[list[str | None]] = []
-            for item in data:  # 🔒 list order preserved
-                rows.append([
-                    str(item.get(h)) if item.get(h) is not None else None
-                    for h in headers
-                ])
-
-            tables.append(
-                TablePage(
-                    id=str(uuid.uuid4()),
-                    bbox=(0, y, 0, y),
-                    data=[headers] + rows,
-                    top=y,
-                    x0=0,
-                    x1=800,
-                    bottom=y,
-                    page_number=page_number,
-                )
-            )
-            y += 14 * (len(rows) + 1)
+def iter_json_events(json_bytes: bytes) -> Iterator[tuple[str, object]]:
+    """
+    Parse incrementally into (event, value) pairs. Raises ValueError as
+    soon as the bytes stop being one valid UTF-8 JSON document.
+    """
+    return _read_events(io.BytesIO(json_bytes))
 
-        else:
-            for idx, item in enumerate(data):
-                _walk_json(item, path + [str(idx)], lines, tables, [y], page_number)
-                y = y_ref[0]
 
-    # ---------- scalar ----------
-    else:
-        lines.append(
+def _read_events(source: io.BytesIO) -> Iterator[tuple[str, object]]:
+    try:
+        yield from ijson.basic_parse(source, use_float=True)
+    except ijson.JSONError as e:
+        raise ValueError(f"Invalid JSON file: {e}")
+
+
+class _PageBuilder:
+    """
+    Lays headings and table windows out top to bottom, one page at a time.
+
+    Scalars are collected as (key, value) rows of a table under the
+    heading of their object or array: a short line of body text would be
+    taken for a heading by the analyzer and never reach chunk text.
+    """
+
+    def __init__(self, source: io.BytesIO):
+        self.source = source
+        self.lines: list[Line] = []
+        self.tables: list[TablePage] = []
+        self.size = 0  # lines and table rows in the current page
+        self.y = 0.0
+        self.pages = 0
+
+        # the (title, level) last laid out, which rows and tables fall under
+        self.heading: tuple[str, int] | None = None
+        # scalar rows not laid out yet
+        self.rows: list[list[str | None]] = []
+        self.rows_id: str | None = None
+        self.rows_offset = 0
+
+    def under(self, heading: tuple[str, int]) -> Iterator[Page]:
+        """Lay `heading` out again if other headings came after it."""
+        if self.heading is heading:
+            return
+
+        title, level = heading
+        size = 26 - 2 * min(level, 6)
+        self.lines.append(
             Line(
-                text=str(data),
+                text=title,
                 words=[],
-                top=y,
-                avg_size=12,
-                is_bold=False,
-                x0=len(path) * 20,
+                top=self.y,
+                avg_size=size,
+                is_bold=True,
+                x0=0,
                 x1=800,
-                bottom=y + 12,
+                bottom=self.y + size,
             )
         )
-        y += 12
+        # the gap keeps consecutive headings from merging into one block
+        self.y += 2 * size
+        self.heading = heading
+
+        yield from self._grow(1)
+
+    def row(self, heading: tuple[str, int], key: str, value) -> Iterator[Page]:
+        yield from self.under(heading)
+        self.rows.append([key, None if value is None else str(value)])
+
+        if len(self.rows) >= JSON_WINDOW_ROWS:
+            yield from self._flush_rows()
+
+    def end_rows(self) -> Iterator[Page]:
+        """Close the table of the rows collected so far."""
+        yield from self._flush_rows()
+        self.rows_id = None
+        self.rows_offset = 0
+
+    def table(
+        self,
+        table_id: str,
+        headers: list[str],
+        rows: list[list[str | None]],
+        offset: int,
+    ) -> Iterator[Page]:
+        self.tables.append(
+            TablePage(
+                id=table_id,
+                bbox=(0, self.y, 0, self.y),
+                data=[headers] + rows,
+                top=self.y,
+                x0=0,
+                x1=800,
+                bottom=self.y,
+                page_number=1,
+                row_offset=offset,
+            )
+        )
+        self.y += 14 * (len(rows) + 1)
+
+        yield from self._grow(len(rows) + 1)
+
+    def page(self) -> Page:
+        page = Page(
+            page_number=1,
+            text="\n".join(lin.text for lin in self.lines),
+            lines=self.lines,
+            tables=self.tables,
+            images=[],
+            width=None,
+            height=None,
+            source_offset=self.source.tell(),
+        )
+        self.lines = []
+        self.tables = []
+        self.size = 0
+        self.pages += 1
+        return page
+
+    def _flush_rows(self) -> Iterator[Page]:
+        if not self.rows:
+            return
+
+        if self.rows_id is None:
+            self.rows_id = str(uuid.uuid4())
+        rows, self.rows = self.rows, []
+        yield from self.table(self.rows_id, ["key", "value"], rows, self.rows_offset)
+        self.rows_offset += len(rows)
+
+    def _grow(self, size: int) -> Iterator[Page]:
+        self.size += size
+        if self.size >= JSON_PAGE_LINES:
+            yield self.page()
+
+
+class _Scope:
+    """An open object or array and the heading its values fall under."""
+
+    __slots__ = ("heading", "index")
+
+    def __init__(self, heading: tuple[str, int], index: int | None):
+        self.heading = heading
+        self.index = index  # the next index of an array, None for an object
+
+
+def _iter_pages(events: Iterator[tuple[str, object]], source: io.BytesIO) -> Iterator[Page]:
+    out = _PageBuilder(source)
+
+    root = ("JSON Document", 0)
+    yield from out.under(root)
+
+    scopes: list[_Scope] = []
+    key = ""
+    pushed_back: list[tuple[str, object]] = []
+
+    def next_event():
+        return pushed_back.pop() if pushed_back else next(events)
+
+    while True:
+        try:
+            event, value = next_event()
+        except StopIteration:
+            break
+
+        if event == "map_key":
+            key = str(value)
+            continue
+
+        if event in ("end_map", "end_array"):
+            yield from out.end_rows()
+            scopes.pop()
+            continue
+
+        # ---------- a value starts ----------
+        scope = scopes[-1] if scopes else None
+        heading = scope.heading if scope else root
+        if scope is not None and scope.index is not None:
+            key = str(scope.index)
+            scope.index += 1
+
+        if event not in ("start_map", "start_array"):
+            yield from out.row(heading, key, value)
+            continue
+
+        yield from out.end_rows()
+        if scope is not None and scope.index is None:
+            # an object member heads a section one level below its object;
+            # an array item shares the heading of its array
+            heading = (key, heading[1] + 1)
+            yield from out.under(heading)
+
+        if event == "start_map":
+            scopes.append(_Scope(heading, None))
+            continue
+
+        first = next_event()
+        pushed_back.append(first)
+
+        if first[0] == "start_map":
+            # table-like list
+            yield from out.under(heading)
+            count, rest = yield from _stream_records(out, next_event)
+            if rest is None:
+                continue
+
+            # not every item is an object: walk the rest one by one
+            pushed_back.append(rest)
+            scopes.append(_Scope(heading, count))
+            continue
+
+        scopes.append(_Scope(heading, 0))
+
+    yield from out.end_rows()
+    if out.lines or out.tables or not out.pages:
+        yield out.page()
+
+
+def _stream_records(out: _PageBuilder, next_event):
+    """
+    Read an array of objects one record at a time and emit it as windows
+    of a table, starting a new table when a record brings new keys.
+    Returns the number of records read and, if the array holds something
+    other than an object, the event that starts it.
+    """
+    table_id = str(uuid.uuid4())
+    headers: list[str] | None = None
+    known: set[str] = set()
+    rows: list[list[str | None]] = []
+    offset = 0
+    count = 0
+
+    while True:
+        event, value = next_event()
+        if event != "start_map":
+            break
+
+        item = _read_record(next_event)
+        count += 1
+        if headers is None:
+            headers = list(item.keys())
+            known.update(headers)
+        elif not known.issuperset(item):
+            # a table run renders every window with its first header, so
+            # keys first seen here start a new table with a wider one
+            if rows:
+                yield from out.table(table_id, headers, rows, offset)
+            table_id = str(uuid.uuid4())
+            headers = headers + [k for k in item if k not in known]
+            known.update(item)
+            rows = []
+            offset = 0
+
+        rows.append([
+            str(item.get(h)) if item.get(h) is not None else None
+            for h in headers
+        ])
+
+        if len(rows) >= JSON_WINDOW_ROWS:
+            yield from out.table(table_id, headers, rows, offset)
+            offset += len(rows)
+            rows = []
+
+    if rows:
+        yield from out.table(table_id, headers, rows, offset)
+
+    return count, (None if event == "end_array" else (event, value))
+
+
+def _read_record(next_event) -> dict:
+    """Build the object whose start_map was just read, nested values via _read_value."""
+    record = {}
+
+    while True:
+        event, key = next_event()
+        if event == "end_map":
+            return record
+
+        event, value = next_event()
+        if event in ("start_map", "start_array"):
+            value = _read_value(event, value, next_event)
+        record[key] = value
+
+
+def _read_value(event: str, value, next_event):
+    """Build the value starting with (event, value) from the events that follow."""
+    builder = ijson.ObjectBuilder()
+    depth = 0
+
+    while True:
+        builder.event(event, value)
+
+        if event in ("start_map", "start_array"):
+            depth += 1
+        elif event in ("end_map", "end_array"):
+            depth -= 1
+
+        if depth == 0:
+            return builder.value
+
+        event, value = next_event()
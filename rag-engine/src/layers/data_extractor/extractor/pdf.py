@@ -1,10 +1,16 @@
 import io
+import os
 import re
-from typing import List
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List
 import uuid
 import pdfplumber
 
 from src.layers.data_extractor.models import ImagePage, Line, Page, TablePage, Word
+from src.layers.data_extractor.spatial import BoxIndex, coords
 
 
 # ===============================
@@ -12,65 +18,226 @@ from src.layers.data_extractor.models import ImagePage, Line, Page, TablePage, W
 # ===============================
 LINE_TOLERANCE = 3  # vertical tolerance for grouping words into lines
 TABLE_PADDING = 1.5  # small padding around table bbox to catch overlaps
+PARALLEL_MIN_PAGES = 32  # smaller documents are extracted in-process
+PAGES_PER_TASK = 16  # contiguous page range handed to one worker at a time
+# workers are replaced after this many documents, to contain pdfminer memory growth
+PDF_WORKER_MAX_DOCUMENTS = int(os.getenv("PDF_WORKER_MAX_DOCUMENTS") or 20)
+
+_WORD_CHAR_RE = re.compile(r"\w")
+_DOT_LINE_RE = re.compile(r"(\.\s?){5,}")  # dot leaders, e.g. in a TOC
+_MERGED_WORDS_RE = re.compile(r"([a-z])([A-Z])")
+_SPACES_RE = re.compile(r"[ \t]+")
+
+_pool: ProcessPoolExecutor | None = None
+_pool_documents = 0  # documents started on the current pool
+_pool_users: dict[ProcessPoolExecutor, int] = {}  # documents still running, per pool
+_pool_lock = threading.Lock()
 
 
 # ===============================
 # PUBLIC ENTRY
 # ===============================
 def extract_data_pdf(pdf_bytes: bytes) -> tuple[list[Page], dict]:
-    pages_output: list[Page] = []
+    pages, metadata = stream_data_pdf(pdf_bytes)
+    return list(pages), metadata
+
+
+def stream_data_pdf(pdf_bytes: bytes) -> tuple[Iterator[Page], dict]:
+    """
+    Open the PDF and return a lazy page iterator plus the document metadata.
+    Each page is extracted only when the consumer asks for it and its
+    pdfplumber caches are dropped right after.
+    """
     metadata = {}
 
     try:
-        with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf_doc: 
-            metadata["_page_count"] = len(pdf_doc.pages)
-            metadata["_file_metadata"] = pdf_doc.metadata
+        pdf_doc = pdfplumber.open(io.BytesIO(pdf_bytes))
+        metadata["_page_count"] = len(pdf_doc.pages)
+        metadata["_file_metadata"] = pdf_doc.metadata
+    except Exception as e:
+        raise ValueError(f"Error processing PDF: {e}")
+
+    if metadata["_page_count"] >= PARALLEL_MIN_PAGES and _worker_count() > 1:
+        pdf_doc.close()
+        return _iter_pages_parallel(pdf_bytes, metadata["_page_count"]), metadata
+
+    return _iter_pages(pdf_doc), metadata
 
+
+def _iter_pages(pdf_doc) -> Iterator[Page]:
+    try:
+        with pdf_doc:
             for page_number, page in enumerate(pdf_doc.pages, start=1):
-                tables_output = _extract_tables(page, page_number)
-                words = _extract_words(page)
-                words = _filter_table_words(words, tables_output)
+                yield _extract_page(page, page_number)
+                page.close()
 
-                lines_output = _group_words_into_lines(words)
+    except Exception as e:
+        raise ValueError(f"Error processing PDF: {e}")
+
+
+def _iter_pages_parallel(pdf_bytes: bytes, page_count: int) -> Iterator[Page]:
+    """
+    Fan page ranges out to the process pool and yield pages back in order.
+    Only a few ranges per worker are in flight, so results don't pile up
+    ahead of a slow consumer. The bytes go to a temporary file once, and
+    tasks only carry its path.
+    """
+    max_in_flight = _worker_count() * 2
+    ranges = (
+        (start, min(start + PAGES_PER_TASK, page_count))
+        for start in range(0, page_count, PAGES_PER_TASK)
+    )
+    pending = deque()
 
-                raw_text = "\n".join(line.text for line in lines_output)
-                text = _normalize_text(raw_text)
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+        f.write(pdf_bytes)
+    pool = _acquire_pool()
 
-                images_output = _extract_images(page)
+    try:
+        for start, end in ranges:
+            pending.append(pool.submit(_extract_page_range, f.name, start, end))
 
-                pages_output.append(
-                    Page(
-                        page_number=page_number,
-                        text=text,
-                        lines=lines_output,
-                        tables=tables_output,
-                        images=images_output,
-                        width=page.width,
-                        height=page.height,
-                    )
-                )
+            if len(pending) >= max_in_flight:
+                yield from pending.popleft().result()
 
-        return pages_output, metadata
+        while pending:
+            yield from pending.popleft().result()
 
     except Exception as e:
         raise ValueError(f"Error processing PDF: {e}")
 
+    finally:
+        for future in pending:
+            future.cancel()
+        _release_pool(pool)
+        # a task still running keeps its open file readable
+        os.unlink(f.name)
+
+
+def _extract_page_range(path: str, start: int, end: int) -> list[Page]:
+    # runs in a worker process: every task reopens the same file
+    with pdfplumber.open(path, pages=range(start + 1, end + 1)) as pdf_doc:
+        pages_output: list[Page] = []
+        for page in pdf_doc.pages:
+            pages_output.append(_extract_page(page, page.page_number))
+            page.close()
+        return pages_output
+
+
+def _worker_count() -> int:
+    return int(os.getenv("PDF_EXTRACT_WORKERS") or os.cpu_count() or 1)
+
+
+def _acquire_pool() -> ProcessPoolExecutor:
+    """
+    The pool a new document runs on. After PDF_WORKER_MAX_DOCUMENTS
+    documents, the pool is retired: later documents get a fresh one, and
+    the old one shuts down once the documents still on it are done.
+    """
+    global _pool, _pool_documents
+
+    with _pool_lock:
+        # a worker that died (e.g. OOM) breaks the pool for good; start over
+        if _pool is not None and getattr(_pool, "_broken", False):
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _retire(_pool)
+            _pool = None
+
+        if _pool is not None and _pool_documents >= PDF_WORKER_MAX_DOCUMENTS:
+            _retire(_pool)
+            _pool = None
+
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=_worker_count())
+            _pool_documents = 0
+
+        _pool_documents += 1
+        _pool_users[_pool] = _pool_users.get(_pool, 0) + 1
+        return _pool
+
+
+def _release_pool(pool: ProcessPoolExecutor) -> None:
+    with _pool_lock:
+        _pool_users[pool] -= 1
+        if pool is not _pool:
+            _retire(pool)
+
+
+def _retire(pool: ProcessPoolExecutor) -> None:
+    # caller holds _pool_lock
+    if not _pool_users.get(pool):
+        _pool_users.pop(pool, None)
+        pool.shutdown(wait=False)
+
+
+def _extract_page(page, page_number: int) -> Page:
+    tables_output = _extract_tables(page, page_number)
+    words = _extract_words(page, tables_output)
+
+    lines_output = _group_words_into_lines(words)
+
+    raw_text = "\n".join(line.text for line in lines_output)
+    text = _normalize_text(raw_text)
+
+    images_output = _extract_images(page)
+
+    return Page(
+        page_number=page_number,
+        text=text,
+        lines=lines_output,
+        tables=tables_output,
+        images=images_output,
+        width=page.width,
+        height=page.height,
+    )
+
 
 def _normalize_text(text: str) -> str:
-    text = _fix_hyphen_breaks(text)
-    text = _remove_page_numbers(text)
-    text = _remove_dot_lines(text)
-    text = _remove_lonely_symbols(text)
-    text = _fix_merged_words(text)
-    text = _normalize_spaces(text)
+    """
+    One pass over the page's lines: rejoin hyphenated breaks and drop page
+    numbers, dot leaders and stray symbols. Splitting merged words and
+    collapsing spaces never crosses a newline, so both run once over the
+    surviving text.
+    """
+    output: list[str] = []
+    pending = ""
+
+    for raw in text.split("\n"):
+        # "hyphen-\nated" -> "hyphenated"
+        if pending:
+            if _WORD_CHAR_RE.match(raw):
+                raw = pending[:-1] + raw
+            else:
+                _keep_lines(pending, output)
+            pending = ""
+
+        if raw.endswith("-"):
+            pending = raw
+            continue
+
+        _keep_lines(raw, output)
 
-    text = "\n".join(line.rstrip() for line in text.splitlines())
-    text = re.sub(r"\n{3,}", "\n\n", text)
+    if pending:
+        _keep_lines(pending, output)
 
-    return text.strip()
+    text = _MERGED_WORDS_RE.sub(r"\1 \2", "\n".join(output))
+    return _SPACES_RE.sub(" ", text).strip()
 
 
-def _extract_words(page) -> List[Word]:
+def _keep_lines(raw: str, output: list[str]):
+    for line in raw.splitlines():
+        stripped = line.strip()
+
+        if len(stripped) <= 2 or stripped.isdigit():
+            continue
+
+        if stripped[0] == "." and _DOT_LINE_RE.fullmatch(stripped):
+            continue
+
+        output.append(line.rstrip())
+
+
+def _extract_words(page, tables: list[TablePage]) -> List[Word]:
 
     raw_words = page.extract_words(
         x_tolerance=2,
@@ -79,6 +246,9 @@ def _extract_words(page) -> List[Word]:
         extra_attrs=["size", "fontname"],
     )
 
+    # drop table words before paying for model construction
+    raw_words = _filter_table_words(raw_words, tables)
+
     words: List[Word] = []
 
     for w in raw_words:
@@ -104,54 +274,59 @@ def _group_words_into_lines(words: List[Word]) -> List[Line]:
 
     words_sorted = sorted(words, key=lambda w: (w.top, w.x0))
 
+    # A word joins the oldest line whose first word is within LINE_TOLERANCE.
+    # Words arrive by increasing top, so line anchors are increasing too and
+    # a line that falls out of the window can never be joined again: one
+    # forward-moving pointer replaces the scan over every line so far.
     line_clusters: List[List[Word]] = []
+    first_open = 0
 
     for word in words_sorted:
-        placed = False
-
-        for cluster in line_clusters:
-            if abs(cluster[0].top - word.top) <= LINE_TOLERANCE:
-                cluster.append(word)
-                placed = True
-                break
-
-        if not placed:
+        while (
+            first_open < len(line_clusters)
+            and word.top - line_clusters[first_open][0].top > LINE_TOLERANCE
+        ):
+            first_open += 1
+
+        if first_open < len(line_clusters):
+            line_clusters[first_open].append(word)
+        else:
             line_clusters.append([word])
 
-    lines_output: List[Line] = []
-
-    for cluster in line_clusters:
-        cluster = sorted(cluster, key=lambda w: w.x0)
-
-        line_text = " ".join(w.text for w in cluster)
-
-        avg_size = sum(w.size for w in cluster) / len(cluster)
-
-        is_bold = any("bold" in w.fontname.lower() for w in cluster)
-
-        x0 = min(w.x0 for w in cluster)
-        x1 = max(w.x1 for w in cluster)
-
-        top = min(w.top for w in cluster)
-        bottom = max(w.bottom for w in cluster)
-
-        lines_output.append(
-            Line(
-                text=line_text,
-                words=cluster,
-                top=top,
-                avg_size=avg_size,
-                is_bold=is_bold,
-                x0=x0,
-                x1=x1,
-                bottom=bottom,
-            )
-        )
-
-    # Sort final lines vertically
-    lines_output.sort(key=lambda lin: lin.top)
-
-    return lines_output
+    # Clusters were opened top-down, so lines come out already in vertical order
+    return [_build_line(cluster) for cluster in line_clusters]
+
+
+def _build_line(cluster: List[Word]) -> Line:
+    top = cluster[0].top
+    cluster = sorted(cluster, key=lambda w: w.x0)
+
+    texts = []
+    size_total = 0.0
+    is_bold = False
+    x1 = cluster[0].x1
+    bottom = cluster[0].bottom
+
+    for w in cluster:
+        texts.append(w.text)
+        size_total += w.size
+        if not is_bold and "bold" in w.fontname.lower():
+            is_bold = True
+        if w.x1 > x1:
+            x1 = w.x1
+        if w.bottom > bottom:
+            bottom = w.bottom
+
+    return Line(
+        text=" ".join(texts),
+        words=cluster,
+        top=top,
+        avg_size=size_total / len(cluster),
+        is_bold=is_bold,
+        x0=cluster[0].x0,
+        x1=x1,
+        bottom=bottom,
+    )
 
 
 def _extract_tables(page, page_number):
@@ -203,42 +378,11 @@ def _extract_images(page):
     return images_output
 
 
-def _fix_hyphen_breaks(text: str) -> str:
-    return re.sub(r"-\n(\w)", r"\1", text)
-
-
-def _remove_page_numbers(text: str) -> str:
-    return "\n".join(line for line in text.splitlines() if not line.strip().isdigit())
-
-
-def _normalize_spaces(text: str) -> str:
-    return re.sub(r"[ \t]+", " ", text)
-
-
-def _remove_dot_lines(text: str) -> str:
-    return "\n".join(
-        line
-        for line in text.splitlines()
-        if not re.match(r"^(\.\s?){5,}$", line.strip())
-    )
-
-
-def _remove_lonely_symbols(text: str) -> str:
-    return "\n".join(line for line in text.splitlines() if len(line.strip()) > 2)
-
-
-def _fix_merged_words(text: str) -> str:
-    return re.sub(r"([a-z])([A-Z])", r"\1 \2", text)
-
-
-def _filter_table_words(words: list[Word], tables: list[TablePage]) -> list[Word]:
-    filtered = []
-    for word in words:
-        if not any(_is_inside_bbox(word, table.bbox) for table in tables):
-            filtered.append(word)
-    return filtered
+def _filter_table_words(raw_words: list[dict], tables: list[TablePage]) -> list[dict]:
+    if not tables or not raw_words:
+        return raw_words
 
+    index = BoxIndex(table.bbox for table in tables)
+    inside = index.contains(*coords(raw_words))
 
-def _is_inside_bbox(word: Word, bbox) -> bool:
-    x0, top, x1, bottom = bbox
-    return word.x0 >= x0 and word.x1 <= x1 and word.top >= top and word.bottom <= bottom
+    return [w for w, drop in zip(raw_words, inside.tolist()) if not drop]
@@ -1,4 +1,6 @@
 from io import BytesIO
+from itertools import islice
+from typing import Iterator
 import uuid
 
 from openpyxl import load_workbook
@@ -7,15 +9,26 @@ import xlrd
 from src.layers.data_extractor.models import Line, Page, TablePage
 
 
+# ===============================
+# CONFIG
+# ===============================
+SHEET_WINDOW_ROWS = 256  # rows per table window handed down the pipeline
+
+
 def extract_data_excel(excel_bytes: bytes) -> tuple[list[Page], dict]:
-    """
-    Extract XLS / XLSX while preserving strict stream order:
-    workbook → sheets → rows → cells
-    """
+    pages, metadata = stream_data_excel(excel_bytes)
+    return list(pages), metadata
+
 
-    pages: list[Page] = []
-    page_number = 1
+def stream_data_excel(excel_bytes: bytes) -> tuple[Iterator[Page], dict]:
+    """
+    Open the workbook once, XLSX first and XLS as the fallback, and
+    return a lazy page iterator plus the workbook metadata, preserving
+    strict stream order: workbook → sheets → rows → cells.
 
+    Every sheet is one page number: its name as a heading, then its rows
+    as windows of one table, read only when the consumer asks for them.
+    """
     metadata: dict[str, object] = {
         "_file_type": "excel",
         "_page_count": 0,
@@ -28,105 +41,66 @@ def extract_data_excel(excel_bytes: bytes) -> tuple[list[Page], dict]:
             read_only=True,
             data_only=True,
         )
+    except Exception:
+        wb = None
 
-        for sheet in wb.worksheets:  # 🔒 sheet order preserved
-            page = _extract_xlsx_sheet(sheet, page_number)
-            pages.append(page)
-            page_number += 1
+    if wb is not None:
+        metadata["_page_count"] = len(wb.worksheets)
+        return _iter_xlsx_pages(wb), metadata
 
     # -------- Fallback to XLS --------
-    except Exception:
-        book = xlrd.open_workbook(file_contents=excel_bytes)
+    try:
+        book = xlrd.open_workbook(file_contents=excel_bytes, on_demand=True)
+    except Exception as e:
+        raise ValueError(f"Error processing sheet file: {e}")
 
-        for idx in range(book.nsheets):  # 🔒 sheet order preserved
-            sheet = book.sheet_by_index(idx)
-            page = _extract_xls_sheet(sheet, page_number)
-            pages.append(page)
-            page_number += 1
+    metadata["_page_count"] = book.nsheets
+    return _iter_xls_pages(book), metadata
 
-    metadata["_page_count"] = len(pages)
-    return pages, metadata
 
+def _iter_xlsx_pages(wb) -> Iterator[Page]:
+    try:
+        for page_number, sheet in enumerate(wb.worksheets, start=1):  # 🔒 sheet order preserved
+            rows = (
+                [str(cell) if cell is not None else None for cell in row]  # 🔒 cell order preserved
+                for row in sheet.iter_rows(values_only=True)  # 🔒 row order preserved
+            )
+            yield from _sheet_pages(sheet.title, rows, page_number)
 
-def _extract_xlsx_sheet(sheet, page_number: int) -> Page:
-    lines: list[Line] = []
-    tables: list[TablePage] = []
+    except Exception as e:
+        raise ValueError(f"Error processing XLSX sheet: {e}")
 
-    y = 0.0
+    finally:
+        wb.close()
 
-    rows = list(sheet.iter_rows(values_only=True))  # 🔒 row order preserved
 
-    if not rows:
-        return Page(
-            page_number=page_number,
-            text="",
-            lines=[],
-            tables=[],
-            images=[],
-            width=None,
-            height=None,
-        )
-
-    headers: list[str | None] = [str(c) if c is not None else None for c in rows[0]]
-
-    table_rows: list[list[str | None]] = []
-
-    for row in rows[1:]:  # 🔒 row order preserved
-        table_rows.append([
-            str(cell) if cell is not None else None
-            for cell in row  # 🔒 cell order preserved
-        ])
-
-    tables.append(
-        TablePage(
-            id=str(uuid.uuid4()),
-            bbox=(0, y, 0, y),
-            data=[headers] + table_rows,
-            top=y,
-            x0=0,
-            x1=800,
-            bottom=y + 14 * (len(table_rows) + 1),
-            page_number=page_number,
-        )
-    )
-
-    # Optional text representation (useful for search)
-    for row in rows:
-        line_text = " | ".join(str(cell) if cell is not None else "" for cell in row)
-
-        lines.append(
-            Line(
-                text=line_text,
-                words=[],
-                top=y,
-                avg_size=12,
-                is_bold=False,
-                x0=0,
-                x1=800,
-                bottom=y + 12,
+def _iter_xls_pages(book) -> Iterator[Page]:
+    try:
+        for idx in range(book.nsheets):  # 🔒 sheet order preserved
+            sheet = book.sheet_by_index(idx)
+            rows = (
+                [str(v) if v != "" else None for v in sheet.row_values(r)]  # 🔒 cell order preserved
+                for r in range(sheet.nrows)  # 🔒 row order preserved
             )
-        )
-        y += 12
+            yield from _sheet_pages(sheet.name, rows, idx + 1)
+            book.unload_sheet(idx)
 
-    return Page(
-        page_number=page_number,
-        text="\n".join(lin.text for lin in lines),
-        lines=lines,
-        tables=tables,
-        images=[],
-        width=None,
-        height=None,
-    )
+    except Exception as e:
+        raise ValueError(f"Error processing XLS sheet: {e}")
 
+    finally:
+        book.release_resources()
 
-def _extract_xls_sheet(sheet, page_number: int) -> Page:
-    lines: list[Line] = []
-    tables: list[TablePage] = []
 
-    y = 0.0
+def _sheet_pages(
+    title: str,
+    rows: Iterator[list[str | None]],
+    page_number: int,
+) -> Iterator[Page]:
+    headers = next(rows, None)
 
-    if sheet.nrows == 0:
-        return Page(
+    if headers is None:
+        yield Page(
             page_number=page_number,
             text="",
             lines=[],
@@ -135,59 +109,65 @@ def _extract_xls_sheet(sheet, page_number: int) -> Page:
             width=None,
             height=None,
         )
+        return
 
-    headers: list[str | None] = [
-        str(sheet.cell_value(0, col)) if sheet.cell_value(0, col) != "" else None
-        for col in range(sheet.ncols)
-    ]
-
-    table_rows: list[list[str | None]] = []
-
-    for r in range(1, sheet.nrows):  # 🔒 row order preserved
-        table_rows.append([
-            str(sheet.cell_value(r, c)) if sheet.cell_value(r, c) != "" else None
-            for c in range(sheet.ncols)  # 🔒 cell order preserved
-        ])
-
-    tables.append(
-        TablePage(
-            id=str(uuid.uuid4()),
-            bbox=(0, y, 0, y),
-            data=[headers] + table_rows,
-            top=y,
-            x0=0,
-            x1=800,
-            bottom=y + 14 * (len(table_rows) + 1),
-            page_number=page_number,
-        )
+    table_id = str(uuid.uuid4())
+    y = 0.0
+
+    # the sheet name heads a section of its own, so its table is chunked
+    title_line = Line(
+        text=title,
+        words=[],
+        top=y,
+        avg_size=22,
+        is_bold=True,
+        x0=0,
+        x1=300,
+        bottom=y + 22,
     )
+    y += 28
 
-    for r in range(sheet.nrows):
-        row_text = " | ".join(
-            str(sheet.cell_value(r, c)) if sheet.cell_value(r, c) != "" else ""
-            for c in range(sheet.ncols)
-        )
+    window = list(islice(rows, SHEET_WINDOW_ROWS))
+    lines = [title_line]
+    offset = 0
 
-        lines.append(
-            Line(
-                text=row_text,
-                words=[],
-                top=y,
-                avg_size=12,
-                is_bold=False,
-                x0=0,
-                x1=800,
-                bottom=y + 12,
-            )
+    while True:
+        yield Page(
+            page_number=page_number,
+            text="\n".join(lin.text for lin in lines),
+            lines=lines,
+            tables=[_table(table_id, headers, window, offset, page_number, y)],
+            images=[],
+            width=None,
+            height=None,
         )
-        y += 12
 
-    return Page(
+        offset += len(window)
+        window = list(islice(rows, SHEET_WINDOW_ROWS))
+        if not window:
+            return
+
+        # later windows carry the table only
+        lines = []
+        y = 0.0
+
+
+def _table(
+    table_id: str,
+    headers: list[str | None],
+    rows: list[list[str | None]],
+    offset: int,
+    page_number: int,
+    y: float,
+) -> TablePage:
+    return TablePage(
+        id=table_id,
+        bbox=(0, y, 0, y),
+        data=[headers] + rows,
+        top=y,
+        x0=0,
+        x1=800,
+        bottom=y + 14 * (len(rows) + 1),
         page_number=page_number,
-        text="\n".join(lin.text for lin in lines),
-        lines=lines,
-        tables=tables,
-        images=[],
-        width=None,
-        height=None,
+        row_offset=offset,
     )
@@ -41,6 +41,9 @@ class TablePage(BaseModel):
     x1: float
     bottom: float
     page_number: int
+    # a long table can arrive as several windows sharing one id; each
+    # repeats the header row and starts at this data row of the table
+    row_offset: int = 0
 
 
 class Page(BaseModel):
@@ -51,6 +54,9 @@ class Page(BaseModel):
     images: list[ImagePage]
     width: float | None
     height: float | None
+    # for a source parsed as one long page, e.g. CSV or JSON: bytes of
+    # it read by the time this page was built, to report progress by
+    source_offset: int | None = None
 
 
 Page.model_rebuild()
@@ -0,0 +1,59 @@
+from typing import Iterable, Sequence
+import numpy as np
+
+
+# ===============================
+# CONFIG
+# ===============================
+MAX_MASK_CELLS = 1 << 20  # items x boxes compared per vectorised block
+
+
+class BoxIndex:
+    """
+    Axis-aligned (x0, top, x1, bottom) boxes held as NumPy columns, so a
+    whole page of items can be tested against every box in one pass
+    instead of item-by-item Python loops.
+    """
+
+    def __init__(self, boxes: Iterable[Sequence[float]]):
+        arr = np.asarray(list(boxes), dtype=float).reshape(-1, 4)
+        self.x0 = arr[:, 0]
+        self.top = arr[:, 1]
+        self.x1 = arr[:, 2]
+        self.bottom = arr[:, 3]
+
+    def __len__(self) -> int:
+        return len(self.x0)
+
+    def contains(self, x0, top, x1, bottom) -> np.ndarray:
+        """Mask of items lying fully inside at least one box."""
+        n = len(x0)
+        mask = np.zeros(n, dtype=bool)
+
+        if n == 0 or len(self) == 0:
+            return mask
+
+        # bound the (items x boxes) temporaries on pages with many tables
+        step = max(1, MAX_MASK_CELLS // len(self))
+
+        for start in range(0, n, step):
+            sl = slice(start, start + step)
+            mask[sl] = (
+                (x0[sl, None] >= self.x0)
+                & (x1[sl, None] <= self.x1)
+                & (top[sl, None] >= self.top)
+                & (bottom[sl, None] <= self.bottom)
+            ).any(axis=1)
+
+        return mask
+
+
+def coords(items, keys=("x0", "top", "x1", "bottom")) -> tuple[np.ndarray, ...]:
+    """Column arrays of item coordinates, from dicts or attribute objects."""
+
+    if items and isinstance(items[0], dict):
+        cols = [[item[k] for item in items] for k in keys]
+    else:
+        cols = [[getattr(item, k) for item in items] for k in keys]
+
+    return tuple(np.asarray(col, dtype=float) for col in cols)
@@ -1,11 +1,16 @@
 from typing import List
 from qdrant_client.conversions.common_types import PointStruct
+from qdrant_client.http import models
 from src.layers.chunking_embedding.models import Chunk
-from src.common.utils import VECTOR_SIZE, qclient, COLLECTION_NAME
+from src.common.dedupe import dedupe_index
+from src.common.query_cache import query_cache
+from src.common.utils import get_qdrant, get_vector_size, COLLECTION_NAME
 
 
 def store_chunks(chunks: List[Chunk], batch_size: int = 64) -> None:
 
+    vector_size = get_vector_size()
+
     for i in range(0, len(chunks), batch_size):
         batch = chunks[i : i + batch_size]
         points: List[PointStruct] = []
@@ -39,11 +44,59 @@ def store_chunks(chunks: List[Chunk], batch_size: int = 64) -> None:
             )
 
             # Correct validation
-            assert len(chunk.dense_vectors) == VECTOR_SIZE
+            assert len(chunk.dense_vectors) == vector_size
 
         if points:
-            qclient.upsert(
+            # applied before the bump below, so a query racing it can't
+            # cache an answer without these points under the new generation
+            get_qdrant().upsert(
                 collection_name=COLLECTION_NAME,
                 points=points,
-                wait=False
+                wait=True,
             )
+
+            for user_id, file_hash in {
+                (p.payload.get("_user_id"), p.payload.get("_file_hash")) for p in points
+            }:
+                if user_id is not None and file_hash is not None:
+                    dedupe_index.add(user_id, file_hash)
+
+            for user_id in {p.payload.get("_user_id") for p in points}:
+                if user_id is not None:
+                    query_cache.bump(user_id)
+
+
+def delete_document(user_id: str, file_hash: str) -> None:
+    dedupe_index.discard(user_id, file_hash)
+    get_qdrant().delete(
+        collection_name=COLLECTION_NAME,
+        wait=True,
+        points_selector=models.FilterSelector(filter=_document_filter(user_id, file_hash)),
+    )
+    query_cache.bump(user_id)
+
+
+def set_document_payload(user_id: str, file_hash: str, payload: dict) -> None:
+    """Add `payload` to every chunk of a stored document."""
+    get_qdrant().set_payload(
+        collection_name=COLLECTION_NAME,
+        payload=payload,
+        points=_document_filter(user_id, file_hash),
+        wait=True,
+    )
+    query_cache.bump(user_id)
+
+
+def _document_filter(user_id: str, file_hash: str) -> models.Filter:
+    return models.Filter(
+        must=[
+            models.FieldCondition(
+                key="_user_id",
+                match=models.MatchValue(value=user_id),
+            ),
+            models.FieldCondition(
+                key="_file_hash",
+                match=models.MatchValue(value=file_hash),
+            ),
+        ]
+    )
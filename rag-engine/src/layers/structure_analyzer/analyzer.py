@@ -1,39 +1,113 @@
 import re
 import uuid
-from typing import List
+from bisect import bisect_left
+from collections import deque
+from itertools import islice
+from typing import Iterable, Iterator, List, Tuple
 
 from src.layers.data_extractor.models import Line, Page, TablePage
 from src.layers.structure_analyzer.models import Paragraph, Section, StructuredDocument
 
 
+# ==========================================================
+# CONFIG
+# ==========================================================
+LAYOUT_LOOKAHEAD_PAGES = 16  # pages sampled for font tiers when streaming
+
+# (kind, item, enclosing sections) — kind is "section", "paragraph" or "table"
+LayoutEvent = Tuple[str, Paragraph | TablePage | Section, List[Section]]
+
+
 # ==========================================================
 # PUBLIC API
 # ==========================================================
 def analyze_layout(pages: List[Page]) -> StructuredDocument:
 
     document = StructuredDocument()
-    stack: List[Section] = []
 
     if not pages:
         return document
 
     font_tiers = _compute_font_tiers(pages)
 
+    for kind, item, parents in _layout_events(pages, font_tiers):
+        owner = parents[-1] if parents else None
+
+        if kind == "section":
+            if owner:
+                owner.children.append(item)
+                owner.content_stream.append(item)
+            else:
+                document.sections.append(item)
+        elif owner:
+            owner.content_stream.append(item)
+        else:
+            document.preamble.append(item)
+
+    return document
+
+
+def iter_layout(
+    pages: Iterable[Page],
+    lookahead: int = LAYOUT_LOOKAHEAD_PAGES,
+) -> Iterator[LayoutEvent]:
+    """
+    Streaming counterpart of analyze_layout.
+
+    Font tiers are computed from the first `lookahead` pages; sizes first
+    seen later are slotted into the existing tiers. Leading pages without
+    text (covers, scans) do not count towards the lookahead. Sections are
+    never filled in, so memory does not grow with the document.
+    """
+
+    pages = iter(pages)
+    window = deque(islice(pages, lookahead))
+
+    if not window:
+        return
+
+    # with no lines sampled every later size would land in tier 1
+    if not any(page.lines for page in window):
+        for page in pages:
+            window.append(page)
+            if page.lines:
+                window.extend(islice(pages, lookahead - 1))
+                break
+
+    font_tiers = _compute_font_tiers(window)
+
+    def page_stream():
+        while window:
+            yield window.popleft()
+
+        for page in pages:
+            _extend_font_tiers(font_tiers, page)
+            yield page
+
+    yield from _layout_events(page_stream(), font_tiers)
+
+
+def _layout_events(pages: Iterable[Page], font_tiers) -> Iterator[LayoutEvent]:
+
+    stack: List[Section] = []
+
     for page in pages:
         # ---- normalize reading order ----
         page_lines = _normalize_reading_order(page.lines)
 
         # ---- detect columns ----
         columns = _cluster_columns(page_lines)
+        # a page without text, e.g. a window of a long table, still has its tables
+        if not columns:
+            columns = [[]]
 
-   
         for column_lines in columns:
             text_blocks = _build_blocks(column_lines)
             layout_stream = _merge_layout_blocks(text_blocks, page.tables)
             for kind, item in layout_stream:
                 if kind == "table":
                     if stack:
-                        stack[-1].content_stream.append(item.table)
+                        yield "table", item.table, list(stack)
                     continue
                 block = item
                 heading_level, confidence = _detect_heading(block, font_tiers)
@@ -54,12 +128,7 @@ def analyze_layout(pages: List[Page]) -> StructuredDocument:
                     while stack and stack[-1].level >= heading_level:
                         stack.pop()
 
-                    if stack:
-                        stack[-1].children.append(section)
-                        stack[-1].content_stream.append(section)
-                    else:
-                        document.sections.append(section)
-
+                    yield "section", section, list(stack)
                     stack.append(section)
                     continue
 
@@ -71,12 +140,7 @@ def analyze_layout(pages: List[Page]) -> StructuredDocument:
                     page_number=page.page_number,
                 )
 
-                if stack:
-                    stack[-1].content_stream.append(paragraph)
-                else:
-                    document.preamble.append(paragraph)
-
-    return document
+                yield "paragraph", paragraph, list(stack)
 
 
 def _normalize_reading_order(lines: List[Line]) -> List[Line]:
@@ -121,6 +185,9 @@ class Block:
 
 def _build_blocks(lines: List[Line]) -> List[Block]:
 
+    if not lines:
+        return []
+
     blocks = []
     current = [lines[0]]
 
@@ -137,7 +204,7 @@ def _build_blocks(lines: List[Line]) -> List[Block]:
     return blocks
 
 
-def _compute_font_tiers(pages: List[Page]):
+def _compute_font_tiers(pages: Iterable[Page]):
 
     sizes = []
 
@@ -151,6 +218,23 @@ def _compute_font_tiers(pages: List[Page]):
     return {size: idx + 1 for idx, size in enumerate(unique)}
 
 
+def _extend_font_tiers(font_tiers, page: Page):
+
+    known = None
+
+    for line in page.lines:
+        size = round(line.avg_size, 1)
+        if size in font_tiers:
+            continue
+
+        if known is None:
+            known = sorted(font_tiers)
+
+        # share the tier of the nearest larger known size
+        larger = len(known) - bisect_left(known, size)
+        font_tiers[size] = max(larger, 1)
+
+
 def _detect_heading(block, font_tiers):
 
     if _is_code_like(block):
@@ -1,7 +1,11 @@
 from dotenv import load_dotenv
 from fastapi import FastAPI
-from src.store.routers import store_upload_router, store_url_router
+from src.store.routers import store_jobs_router, store_upload_router, store_url_router
 from src.query.controller import query_router 
+from src.common.metrics import metrics_router
+from src.common.health import health_router
+from src.common.model_registry import model_registry
+from contextlib import asynccontextmanager
 from .logging import configure_logging, LogLevels
 from pathlib import Path
 
@@ -10,7 +14,19 @@ env_path = Path(__file__).parent.parent / '.env'
 
 load_dotenv(dotenv_path=env_path)
 configure_logging(LogLevels.info)
-app = FastAPI()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # models load in the background; /readyz reports when they are done
+    model_registry.start()
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
 app.include_router(store_upload_router)
 app.include_router(store_url_router)
+app.include_router(store_jobs_router)
 app.include_router(query_router)
+app.include_router(metrics_router)
+app.include_router(health_router)
@@ -1,11 +1,11 @@
 from typing import List
-from fastapi import APIRouter, Form, HTTPException, status
+from fastapi import APIRouter, Form, HTTPException, Response, status
 from src.query.model import QueryResponse
 from qdrant_client.models import Optional
 
 import logging
 from src.common.utils import parse_metadata
-from src.query.service import query
+from src.query.service import cached_query
 
 query_router = APIRouter(tags=["Query"])
 
@@ -16,7 +16,8 @@ query_router = APIRouter(tags=["Query"])
     response_model=List[QueryResponse],
     status_code=status.HTTP_200_OK,
 )
-def chunk_query(
+async def chunk_query(
+    response: Response,
     queries: list[str] = Form(..., description="query list"),
     metadata: Optional[str] = Form(..., description="Metadata for chunks (JSON)"),
     top_result: int | None = Form(None, description="top results"),
@@ -30,6 +31,7 @@ def chunk_query(
             detail="Missing '_user_id' in metadata",
         )
     final_top_k = top_result if top_result else 10
-    chunks = query(queries, meta, final_top_k)
+    chunks, from_cache = await cached_query(queries, meta, final_top_k)
+    response.headers["X-Cache"] = "HIT" if from_cache else "MISS"
     logging.info(f"Query sucscesfully :{len(chunks)}")
     return chunks
@@ -1,11 +1,10 @@
-import os
+import asyncio
+import hashlib
 import numpy as np
-import math
 from typing import List, Dict, Optional, Tuple
-from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor
-from functools import lru_cache
+from collections import OrderedDict, defaultdict
 import logging
+import threading
 
 from src.query.model import QueryResponse, Reference
 from qdrant_client.http import models
@@ -16,18 +15,22 @@ from qdrant_client.models import (
     Condition,
 )
 
+from src.common import metrics
+from src.common.inference import QUERY, MicroBatcher, inference
+from src.common.lru import LRUCache
+from src.common.query_cache import query_cache
 from src.common.utils import (
     COLLECTION_NAME,
-    dense_embedding,
-    sparse_embedding,
-    reranker,
-    qclient,
+    DENSE_MODEL,
+    get_dense_embedding,
+    get_sparse_embedding,
+    get_async_qdrant,
+    get_reranker,
 )
+from src.layers.chunking_embedding.chunk_document import chunk_point_id
 from src.query.model import Hit
 
 
-_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 4)
-
 _CANDIDATE_POOL = 50
 _RERANK_BATCH_SIZE = 64
 
@@ -37,43 +40,82 @@ _MIN_RERANK_SCORE = 0.15
 _RELATIVE_RERANK_DROP = 0.30
 _NEIGHBOR_WINDOW = 2
 
+_QUERY_EMBEDDING_CACHE_SIZE = 512
+_RERANK_CACHE_SIZE = 20_000
+_query_embedding_cache: OrderedDict[str, Dict] = OrderedDict()
+_query_embedding_cache_lock = threading.Lock()
+_rerank_cache = LRUCache(_RERANK_CACHE_SIZE)
+metrics.register("rerank_cache", _rerank_cache.stats)
+
 
-def query(
+async def cached_query(
+    queries: List[str],
+    metadata: Optional[Dict],
+    final_top_k: int,
+) -> Tuple[List[QueryResponse], bool]:
+    """
+    `query_async` behind the per-user result cache. Returns the results
+    and whether they were served from the cache.
+    """
+
+    meta_filter = _build_metadata_filter(metadata)
+    key = query_cache.key(
+        (metadata or {}).get("_user_id"),
+        tuple(" ".join(q.split()) for q in queries),
+        meta_filter.model_dump_json() if meta_filter else "",
+        final_top_k,
+    )
+
+    cached = query_cache.get(key)
+    if cached is not None:
+        return cached, True
+
+    results = await query_async(queries, metadata, final_top_k)
+    query_cache.put(key, results, sum(len(r.model_dump_json()) for r in results))
+    return results, False
+
+
+async def query_async(
     queries: List[str],
     metadata: Optional[Dict],
     final_top_k: int,
 ) -> List[QueryResponse]:
+    """
+    Expand, embed, hybrid search, rerank, add neighbours, rerank again and
+    pack, without blocking the event loop: Qdrant is reached through the
+    async client, and model calls are queued on the inference scheduler
+    at query priority and awaited as futures, so no thread is held while
+    a request waits for a model.
+    """
 
     expanded_queries = _expand_queries(queries)
-    logging.info(f"expanded queries and clean up to {len(expanded_queries)}")
-
     meta_filter = _build_metadata_filter(metadata)
-    logging.info("Build filtering..")
 
-    query_embeddings = _embed_queries(expanded_queries)
+    query_embeddings = await _embed_queries(expanded_queries)
     logging.info(f"query embeded : {len(query_embeddings)}")
 
-    hits = _hybrid_query(query_embeddings, meta_filter, _CANDIDATE_POOL)
+    hits: List[Hit] = []
+    if query_embeddings:
+        qdrant = await get_async_qdrant()
+        responses = await qdrant.query_batch_points(
+            collection_name=COLLECTION_NAME,
+            requests=_hybrid_requests(query_embeddings, meta_filter, _CANDIDATE_POOL),
+        )
+        hits = _hits_from_responses(responses)
     logging.info(f"hybrid query first hits : {len(hits)}")
 
     hits = _normalize_scores(hits)
-    logging.info(f"hits after normalized scores : {len(hits)}")
 
-    hits = _rerank(expanded_queries[0], hits, final_top_k)
-    logging.info(
-        f"hits after reranking : {len(hits)} with final_top: {math.floor(final_top_k / 2) + 1}"
-    )
+    hits = await _rerank(expanded_queries[0], hits, final_top_k)
+    logging.info(f"hits after reranking : {len(hits)}")
 
-    neighbors = _expand_neighbors(hits)
+    neighbors = await _expand_neighbors(hits)
     logging.info(f"getting neighbors of the hits : {len(neighbors)}")
 
     hits.extend(neighbors)
-    logging.info(f"add all neighbors to hits , Total Hits: {len(neighbors)}")
 
-    hits = _rerank(expanded_queries[0], hits, final_top_k)
-    logging.info(
-        f"make second reranking for hits : {len(hits)} with final_top: {final_top_k}"
-    )
+    hits = await _rerank(expanded_queries[0], hits, final_top_k)
+    logging.info(f"make second reranking for hits : {len(hits)}")
 
     return _pack_context(hits)
 
@@ -92,34 +134,58 @@ def _expand_queries(queries: List[str]) -> List[str]:
     return list(expanded)
 
 
-@lru_cache(maxsize=512)
-def _embed_single_query(query: str):
+async def _embed_queries(queries: List[str]) -> List[Dict]:
+    """
+    Embed every query variant not already cached, then serve all variants
+    from the cache. The misses go to the dense and sparse micro-batchers,
+    so concurrent requests share one model call per window.
+    """
+    with _query_embedding_cache_lock:
+        cached = {q: _query_embedding_cache[q] for q in queries if q in _query_embedding_cache}
+        for q in cached:
+            _query_embedding_cache.move_to_end(q)
 
-    prefixed = f"query: {query}"
+    missing = list(dict.fromkeys(q for q in queries if q not in cached))
 
-    def dense_task():
-        return list(dense_embedding.embed([prefixed]))[0]
+    if missing:
+        dense_prefixed = [f"{DENSE_MODEL.query_prefix}{q}" for q in missing]
+        sparse_prefixed = [f"query: {q}" for q in missing]
 
-    def sparse_task():
-        return list(sparse_embedding.embed([prefixed]))[0]
+        dense_vectors, sparse_vectors = await asyncio.gather(
+            asyncio.wrap_future(_dense_batcher.submit(dense_prefixed)),
+            asyncio.wrap_future(_sparse_batcher.submit(sparse_prefixed)),
+        )
 
-    fd = _executor.submit(dense_task)
-    fs = _executor.submit(sparse_task)
+        for q, dense, sparse in zip(missing, dense_vectors, sparse_vectors):
+            cached[q] = {
+                "dense": dense.tolist(),
+                "sparse": models.SparseVector(
+                    indices=sparse.indices.tolist(),
+                    values=sparse.values.tolist(),
+                ),
+            }
 
-    dense = fd.result()
-    sparse = fs.result()
+        with _query_embedding_cache_lock:
+            for q in missing:
+                _query_embedding_cache[q] = cached[q]
+            while len(_query_embedding_cache) > _QUERY_EMBEDDING_CACHE_SIZE:
+                _query_embedding_cache.popitem(last=False)
 
-    return {
-        "dense": dense.tolist(),
-        "sparse": models.SparseVector(
-            indices=sparse.indices.tolist(),
-            values=sparse.values.tolist(),
-        ),
-    }
+    return [cached[q] for q in queries]
+
+
+def _embed_dense_queries(texts: List[str]) -> list:
+    return list(get_dense_embedding().embed(texts, batch_size=len(texts)))
 
 
-def _embed_queries(queries: List[str]):
-    return [_embed_single_query(q) for q in queries]
+def _embed_sparse_queries(texts: List[str]) -> list:
+    return list(get_sparse_embedding().embed(texts, batch_size=len(texts)))
+
+
+_dense_batcher = MicroBatcher(_embed_dense_queries, inference)
+_sparse_batcher = MicroBatcher(_embed_sparse_queries, inference)
+metrics.register("dense_query_batching", _dense_batcher.stats)
+metrics.register("sparse_query_batching", _sparse_batcher.stats)
 
 
 def _build_metadata_filter(meta: Optional[Dict]) -> Optional[Filter]:
@@ -143,15 +209,12 @@ def _build_metadata_filter(meta: Optional[Dict]) -> Optional[Filter]:
     return Filter(must=cond) if cond else None
 
 
-def _hybrid_query(
+def _hybrid_requests(
     embeddings: List[Dict], meta_filter: Optional[Filter], limit: int
-) -> List[Hit]:
-
-    results: List[Hit] = []
-
-    for emb in embeddings:
-        res = qclient.query_points(
-            collection_name=COLLECTION_NAME,
+) -> List[models.QueryRequest]:
+    # one RRF request per query variant, all sent in a single round trip
+    return [
+        models.QueryRequest(
             prefetch=[
                 models.Prefetch(
                     query=emb["dense"],
@@ -168,8 +231,17 @@ def _hybrid_query(
             ],
             query=models.FusionQuery(fusion=models.Fusion.RRF),
             limit=limit,
+            with_payload=True,
         )
+        for emb in embeddings
+    ]
+
+
+def _hits_from_responses(responses: List[models.QueryResponse]) -> List[Hit]:
 
+    results: List[Hit] = []
+
+    for res in responses:
         for p in res.points:
             results.append(
                 Hit(
@@ -200,15 +272,9 @@ def _normalize_scores(hits: List[Hit]) -> List[Hit]:
     return hits
 
 
-def _rerank(query: str, hits: List[Hit], top_k: int) -> List[Hit]:
-
-    texts = [h.payload.get("_text", "") for h in hits]
-
-    score_list: List[float] = []
+async def _rerank(query: str, hits: List[Hit], top_k: int) -> List[Hit]:
 
-    for i in range(0, len(texts), _RERANK_BATCH_SIZE):
-        batch = texts[i : i + _RERANK_BATCH_SIZE]
-        score_list.extend(list(reranker.rerank(query, batch)))
+    score_list = await _rerank_scores(query, hits)
 
     if not score_list:
         return []
@@ -224,6 +290,44 @@ def _rerank(query: str, hits: List[Hit], top_k: int) -> List[Hit]:
     return _adaptive_rerank_cutoff(scored, top_k)
 
 
+async def _rerank_scores(query: str, hits: List[Hit]) -> List[float]:
+    """
+    Raw cross-encoder scores of `hits` for `query`. Scores are memoized per
+    (query, point id, text digest), so the second pass of a request and
+    repeated queries only send unseen hits to the model.
+    """
+
+    keys = [
+        (
+            query,
+            h.id,
+            hashlib.blake2b(
+                h.payload.get("_text", "").encode("utf-8"), digest_size=16
+            ).digest(),
+        )
+        for h in hits
+    ]
+    scores = _rerank_cache.get_many(keys)
+
+    missing = [(k, h) for k, h in zip(keys, hits) if k not in scores]
+
+    for i in range(0, len(missing), _RERANK_BATCH_SIZE):
+        batch = missing[i : i + _RERANK_BATCH_SIZE]
+        texts = [h.payload.get("_text", "") for _, h in batch]
+        batch_scores = await asyncio.wrap_future(
+            inference.submit(QUERY, _rerank_batch, query, texts)
+        )
+        fresh = list(zip((k for k, _ in batch), batch_scores))
+        scores.update(fresh)
+        _rerank_cache.put_many(fresh)
+
+    return [scores[k] for k in keys]
+
+
+def _rerank_batch(query: str, texts: List[str]) -> List[float]:
+    return list(get_reranker().rerank(query, texts))
+
+
 def _adaptive_rerank_cutoff(scored: List[Tuple[Hit, float]], top_k: int) -> List[Hit]:
 
     if not scored:
@@ -309,40 +413,94 @@ def _pack_context(hits: List[Hit]) -> List[QueryResponse]:
     return sorted(chunks, key=lambda x: x.score, reverse=True)
 
 
-def _expand_neighbors(hits: List[Hit]) -> List[Hit]:
+async def _expand_neighbors(hits: List[Hit]) -> List[Hit]:
+    """
+    Neighbouring chunks of every hit. Their point ids are derived from
+    (user, file hash, chunk index), so all of them are fetched with one
+    `retrieve`; hits stored before ids were deterministic fall back to a
+    filtered scroll each. The retrieve and the scrolls run concurrently.
+    """
+
+    wanted, legacy = _plan_neighbors(hits)
+    qdrant = await get_async_qdrant()
+
+    async def by_id():
+        if not wanted:
+            return []
+        points = await qdrant.retrieve(
+            collection_name=COLLECTION_NAME,
+            ids=list(wanted),
+            with_payload=True,
+        )
+        return [(wanted[str(p.id)], p) for p in points]
+
+    async def by_scroll(hit: Hit):
+        result, _ = await qdrant.scroll(
+            **_neighbor_scroll(hit.payload["_file_hash"], hit.payload["_chunk_index"])
+        )
+        return [(hit, n) for n in result]
+
+    groups = await asyncio.gather(by_id(), *(by_scroll(h) for h in legacy))
+
+    return _neighbor_hits(hits, [pair for group in groups for pair in group])
+
+
+def _plan_neighbors(hits: List[Hit]) -> Tuple[Dict[str, Hit], List[Hit]]:
+    """
+    Ids of the neighbours to retrieve, each mapped to the hit it was found
+    through, and the legacy hits whose neighbours need a scroll.
+    """
 
-    expanded: List[Hit] = []
     seen_ids = {h.id for h in hits}
+    wanted: Dict[str, Hit] = {}
+    legacy: List[Hit] = []
 
     for hit in hits:
+        uid = hit.payload.get("_user_id")
         fh = hit.payload.get("_file_hash")
         idx = hit.payload.get("_chunk_index")
 
         if fh is None or idx is None:
             continue
 
-        neighbors = _fetch_neighbors(fh, idx)
+        if uid is None or hit.id != chunk_point_id(uid, fh, idx):
+            legacy.append(hit)
+            continue
+
+        for i in range(max(0, idx - _NEIGHBOR_WINDOW), idx + _NEIGHBOR_WINDOW + 1):
+            nid = chunk_point_id(uid, fh, i)
+            if nid not in seen_ids:
+                wanted.setdefault(nid, hit)
 
-        for n in neighbors:
-            nid = str(n.id)
+    return wanted, legacy
 
-            if nid in seen_ids:
-                continue
 
-            expanded.append(
-                Hit(
-                    id=nid,
-                    score=hit.score * 0.85,
-                    payload=n.payload or {},
-                )
+def _neighbor_hits(hits: List[Hit], found: List[Tuple[Hit, models.Record]]) -> List[Hit]:
+
+    expanded: List[Hit] = []
+    seen_ids = {h.id for h in hits}
+
+    for hit, n in found:
+        nid = str(n.id)
+
+        if nid in seen_ids:
+            continue
+
+        seen_ids.add(nid)
+        expanded.append(
+            Hit(
+                id=nid,
+                score=hit.score * 0.85,
+                payload=n.payload or {},
             )
+        )
 
     return expanded
 
 
-def _fetch_neighbors(file_hash, idx):
+def _neighbor_scroll(file_hash, idx) -> Dict:
 
-    result, _ = qclient.scroll(
+    return dict(
         collection_name=COLLECTION_NAME,
         scroll_filter=models.Filter(
             must=[
@@ -361,5 +519,3 @@ def _fetch_neighbors(file_hash, idx):
         ),
         limit=_NEIGHBOR_WINDOW * 2 + 1,
     )
-
-    return result
@@ -0,0 +1,105 @@
+import asyncio
+import json
+import os
+from collections import defaultdict
+from typing import Optional
+from fastapi import Form, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from src.common.fetch import Download, download_slot, fetch_url, host_limits
+from src.store import jobs
+from src.store.controllers import pdf, md, csv, sheet
+from src.store.controllers import json as json_controller
+from src.store.model import BatchItemResponse, JobResponse
+
+MAX_BATCH_URLS = 500
+
+# content type fragment -> controller, first match wins
+_BY_CONTENT_TYPE = [
+    ("application/pdf", pdf),
+    ("text/markdown", md),
+    ("text/csv", csv),
+    ("application/json", json_controller),
+    ("application/vnd.ms-excel", sheet),
+    ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", sheet),
+]
+
+# text/plain is ambiguous, so fall back to the file extension
+_BY_EXTENSION = {
+    ".pdf": pdf,
+    ".md": md,
+    ".mdx": md,
+    ".csv": csv,
+    ".json": json_controller,
+    ".xls": sheet,
+    ".xlsx": sheet,
+}
+
+
+async def with_urls(
+    urls: list[str] = Form(..., description="Links to fetch"),
+    metadata: Optional[str] = Form(..., description="Metadata for chunks (JSON)"),
+    callback_url: Optional[str] = Form(None, description="URL notified when each job finishes"),
+) -> list[BatchItemResponse]:
+    if len(urls) > MAX_BATCH_URLS:
+        raise HTTPException(
+            status.HTTP_400_BAD_REQUEST,
+            f"At most {MAX_BATCH_URLS} URLs per batch",
+        )
+
+    limits = host_limits()
+
+    return list(
+        await asyncio.gather(
+            *(_fetch_and_ingest(url, limits, metadata, callback_url) for url in urls)
+        )
+    )
+
+
+async def _fetch_and_ingest(
+    url: str,
+    limits: defaultdict[str, asyncio.Semaphore],
+    metadata: Optional[str],
+    callback_url: Optional[str],
+) -> BatchItemResponse:
+    # each body is queued as soon as it arrives, and dropped after
+    async with download_slot(url, limits):
+        # once the queue is full, later items would only be downloaded to be turned away
+        if jobs.is_full():
+            return _failed(url, jobs.queue_full())
+
+        try:
+            download = await fetch_url(url)
+            resp = await run_in_threadpool(_ingest, download, metadata, callback_url)
+        except HTTPException as e:
+            return _failed(url, e)
+
+    return BatchItemResponse(
+        url=url,
+        status_code=status.HTTP_202_ACCEPTED,
+        job=JobResponse.model_validate(json.loads(resp.body)),
+    )
+
+
+def _ingest(download: Download, metadata: Optional[str], callback_url: Optional[str]):
+    controller = _controller_for(download)
+    if controller is None:
+        raise HTTPException(
+            status.HTTP_400_BAD_REQUEST,
+            "Unsupported file type",
+        )
+
+    # every batch item becomes a background job
+    return controller.ingest_download(download, metadata, True, callback_url)
+
+
+def _controller_for(download: Download):
+    for fragment, controller in _BY_CONTENT_TYPE:
+        if fragment in download.content_type:
+            return controller
+
+    ext = os.path.splitext(download.filename)[1].lower()
+    return _BY_EXTENSION.get(ext)
+
+
+def _failed(url: str, e: HTTPException) -> BatchItemResponse:
+    return BatchItemResponse(url=url, status_code=e.status_code, error=str(e.detail))
@@ -1,11 +1,10 @@
-import os
-from urllib.parse import urlparse
-import requests
 import hashlib
 from typing import Optional
 from fastapi import File, Form, HTTPException, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from src.common.fetch import Download, fetch_url
 from src.common.utils import document_exists, parse_metadata
-from src.layers.data_extractor.extractor.csv import extract_data_csv
+from src.layers.data_extractor.extractor.csv import stream_data_csv
 from src.store import service
 from src.store.controllers.utils import assert_csv
 
@@ -13,6 +12,8 @@ from src.store.controllers.utils import assert_csv
 async def upload(
     upload: UploadFile = File(..., description="CSV file to upload"),
     metadata: Optional[str] = Form(..., description="Metadata for chunks (JSON)"),
+    background: bool = Form(False, description="Run ingestion as a background job"),
+    callback_url: Optional[str] = Form(None, description="URL notified when the job finishes"),
 ):
     meta = parse_metadata(metadata)
     meta["_source_file"] = upload.filename
@@ -32,39 +33,51 @@ async def upload(
             detail="Missing '_user_id' in metadata",
         )
 
-    if document_exists(user_id, file_hash):
+    if await run_in_threadpool(document_exists, user_id, file_hash):
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Document already uploaded",
         )
 
-    return service.handle(data_bytes, meta, extract_data_csv)
+    return await run_in_threadpool(
+        service.handle_stream, data_bytes, meta, stream_data_csv, background, callback_url
+    )
 
 
-def with_url(
+async def with_url(
     url: str = Form(..., description="Link to fetch CSV"),
     metadata: Optional[str] = Form(..., description="Metadata for chunks (JSON)"),
+    background: bool = Form(False, description="Run ingestion as a background job"),
+    callback_url: Optional[str] = Form(None, description="URL notified when the job finishes"),
 ):
-    resp = requests.get(url, timeout=10)
-    resp.raise_for_status()
+    download = await fetch_url(url)
+    return await run_in_threadpool(
+        ingest_download, download, metadata, background, callback_url
+    )
+
 
-    content_type = resp.headers.get("Content-Type", "").lower()
+def ingest_download(
+    download: Download,
+    metadata: Optional[str],
+    background: bool = False,
+    callback_url: Optional[str] = None,
+):
+    content_type = download.content_type
     if not any(t in content_type for t in ["text/csv", "text/plain"]):
         raise HTTPException(
             status.HTTP_400_BAD_REQUEST,
             "URL does not point to a CSV file",
         )
-    data_bytes = resp.content
+    data_bytes = download.content
     assert_csv(data_bytes)
 
-    parsed = urlparse(url)
-    filename = os.path.basename(parsed.path) or "unknown.csv"
+    filename = download.filename or "unknown.csv"
 
     meta = parse_metadata(metadata)
     meta["_source_file"] = filename
     meta["_file_type"] = "csv"
 
-    file_hash = hashlib.sha256(data_bytes).hexdigest()
+    file_hash = download.file_hash
     meta["_file_hash"] = file_hash
 
     user_id = meta.get("_user_id")
@@ -80,4 +93,4 @@ def with_url(
             detail="Document already uploaded",
         )
 
-    return service.handle(data_bytes, meta, extract_data_csv)
+    return service.handle_stream(data_bytes, meta, stream_data_csv, background, callback_url)
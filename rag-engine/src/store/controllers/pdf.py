@@ -1,12 +1,11 @@
 import hashlib
-import os
 from fastapi import File, Form, HTTPException, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
 from qdrant_client.models import Optional
-import requests
+from src.common.fetch import Download, fetch_url
 from src.common.utils import document_exists
 from src.common.utils import parse_metadata
-from src.layers.data_extractor.extractor.pdf import extract_data_pdf
-from urllib.parse import urlparse
+from src.layers.data_extractor.extractor.pdf import stream_data_pdf
 from src.store import service
 from src.store.controllers.utils import assert_pdf
 
@@ -14,6 +13,8 @@ from src.store.controllers.utils import assert_pdf
 async def upload(
     upload: UploadFile = File(..., description="The file to upload"),
     metadata: Optional[str] = Form(..., description="Metadata for chunks (JSON)"),
+    background: bool = Form(False, description="Run ingestion as a background job"),
+    callback_url: Optional[str] = Form(None, description="URL notified when the job finishes"),
 ):
     meta = parse_metadata(metadata)
     meta["_source_file"] = upload.filename
@@ -30,33 +31,46 @@ async def upload(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Missing '_user_id' in metadata",
         )
-    if document_exists(user_id, file_hash):
+    if await run_in_threadpool(document_exists, user_id, file_hash):
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Document already uploaded",
         )
-    return service.handle(data_bytes, meta, extract_data_pdf)
+    return await run_in_threadpool(
+        service.handle_stream, data_bytes, meta, stream_data_pdf, background, callback_url
+    )
 
 
-def with_url(
+async def with_url(
     url: str = Form(..., description="Link to fetch pdf"),
     metadata: Optional[str] = Form(..., description="Metadata for chunks (JSON)"),
+    background: bool = Form(False, description="Run ingestion as a background job"),
+    callback_url: Optional[str] = Form(None, description="URL notified when the job finishes"),
 ):
-    resp = requests.get(url, timeout=10)
-    resp.raise_for_status()
-    if "application/pdf" not in resp.headers.get("Content-Type", ""):
+    download = await fetch_url(url)
+    return await run_in_threadpool(
+        ingest_download, download, metadata, background, callback_url
+    )
+
+
+def ingest_download(
+    download: Download,
+    metadata: Optional[str],
+    background: bool = False,
+    callback_url: Optional[str] = None,
+):
+    if "application/pdf" not in download.content_type:
         raise HTTPException(
             status.HTTP_400_BAD_REQUEST, "URL does not point to a PDF file"
         )
-    data_bytes = resp.content
+    data_bytes = download.content
     assert_pdf(data_bytes)
-    parsed = urlparse(url)
     meta = parse_metadata(metadata)
-    filename = os.path.basename(parsed.path) or "unkown.pdf"
+    filename = download.filename or "unkown.pdf"
 
     meta["_source_file"] = filename
     meta["_file_type"] = "pdf"
-    file_hash = hashlib.sha256(data_bytes).hexdigest()
+    file_hash = download.file_hash
     meta["_file_hash"] = file_hash
     user_id = meta.get("_user_id")
     if user_id is None:
@@ -69,4 +83,4 @@ def with_url(
             status_code=status.HTTP_409_CONFLICT,
             detail="Document already uploaded",
         )
-    return service.handle(data_bytes, meta, extract_data_pdf)
+    return service.handle_stream(data_bytes, meta, stream_data_pdf, background, callback_url)
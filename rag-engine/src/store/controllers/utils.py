@@ -1,9 +1,8 @@
 import json
-import csv
-import io
 from fastapi import HTTPException, status
 from qdrant_client.models import Optional
-from openpyxl import load_workbook
+from src.layers.data_extractor.extractor.csv import iter_csv_rows
+from src.layers.data_extractor.extractor.json import iter_json_events
 
 
 def parse_metadata(metadata_str: Optional[str]) -> dict:
@@ -38,33 +37,25 @@ def assert_markdown(data: bytes):
 
 
 def assert_csv(data: bytes):
+    # only the header is read here; the rows are validated once, while
+    # they stream into ingestion
     try:
-        text = data.decode("utf-8")
-    except UnicodeDecodeError:
-        raise HTTPException(400, "CSV must be UTF-8 text")
-
-    reader = csv.reader(io.StringIO(text))
-    rows = list(reader)
-    if not rows:
-        raise HTTPException(400, "Empty CSV")
-
-    cols = len(rows[0])
-    if any(len(r) != cols for r in rows):
-        raise HTTPException(400, "Malformed CSV")
+        next(iter_csv_rows(data))
+    except ValueError as e:
+        raise HTTPException(400, str(e))
 
 
 def assert_json(data: bytes):
+    # only the first token is read here; the rest is validated once,
+    # while the document streams into ingestion
     try:
-        json.loads(data.decode("utf-8"))
-    except Exception:
+        next(iter_json_events(data))
+    except (ValueError, StopIteration):
         raise HTTPException(400, "Invalid JSON file")
 
 
 def assert_sheet(data: bytes):
-    if not data.startswith(b"\x50\x4b"):
-        raise HTTPException(400, "Invalid XLSX file")
-
-    try:
-        load_workbook(io.BytesIO(data), read_only=True)
-    except Exception:
-        raise HTTPException(400, "Corrupted XLSX file")
+    # XLSX is a zip, XLS an OLE2 compound file; the workbook itself is
+    # opened and validated once, by the extractor
+    if not data.startswith((b"\x50\x4b", b"\xd0\xcf\x11\xe0")):
+        raise HTTPException(400, "Invalid XLSX or XLS file")
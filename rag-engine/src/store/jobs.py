@@ -0,0 +1,141 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+import requests
+from fastapi import HTTPException, status
+from src.store.model import JobResponse, JobStage, StoreResponse
+
+# ===============================
+# CONFIG
+# ===============================
+MAX_PENDING_JOBS = 100  # queued + running jobs; each one holds its file bytes
+JOB_TTL_SECONDS = 60 * 60  # how long finished jobs stay queryable
+CALLBACK_TIMEOUT = 10
+
+# stage, done, total
+Progress = Callable[[JobStage, int, int], None]
+
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("INGEST_WORKERS") or 2),
+    thread_name_prefix="ingest",
+)
+_lock = threading.Lock()
+_jobs: dict[str, JobResponse] = {}
+_finished_at: dict[str, float] = {}
+_active: dict[tuple[str, str], str] = {}  # (user id, file hash) -> job id
+
+
+def submit(
+    user_id: str,
+    file_hash: str,
+    run: Callable[[Progress], StoreResponse],
+    callback_url: str | None = None,
+) -> JobResponse:
+    """
+    Queue `run` on the ingestion pool and return its job straight away.
+    Re-submitting a document that is still in flight returns the
+    existing job instead of ingesting it twice.
+    """
+    key = (user_id, file_hash)
+
+    with _lock:
+        _prune()
+
+        if key in _active:
+            return _jobs[_active[key]].model_copy()
+
+        if len(_active) >= MAX_PENDING_JOBS:
+            raise queue_full()
+
+        job = JobResponse(
+            job_id=str(uuid.uuid4()),
+            document_id=file_hash,
+            stage=JobStage.queued,
+            callback_url=callback_url,
+        )
+        _jobs[job.job_id] = job
+        _active[key] = job.job_id
+        snapshot = job.model_copy()
+
+    _executor.submit(_run, job.job_id, key, run)
+    return snapshot
+
+
+def is_full() -> bool:
+    with _lock:
+        return len(_active) >= MAX_PENDING_JOBS
+
+
+def queue_full() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Ingestion queue is full, retry later",
+    )
+
+
+def get_job(job_id: str) -> JobResponse | None:
+    with _lock:
+        job = _jobs.get(job_id)
+        return job.model_copy() if job else None
+
+
+def _run(job_id: str, key: tuple[str, str], run: Callable[[Progress], StoreResponse]):
+
+    def progress(stage: JobStage, done: int = 0, total: int = 0):
+        _update(job_id, stage=stage, progress=round(done / total, 3) if total else 0.0)
+
+    try:
+        result = run(progress)
+        _update(job_id, stage=JobStage.done, progress=1.0, result=result)
+    except HTTPException as e:
+        _update(job_id, stage=JobStage.failed, error=str(e.detail))
+    except Exception as e:
+        logging.error(f"Unexpected error in ingestion job {job_id}, {str(e)} ")
+        _update(
+            job_id,
+            stage=JobStage.failed,
+            error="An internal error occurred while processing the file.",
+        )
+    finally:
+        with _lock:
+            _active.pop(key, None)
+            _finished_at[job_id] = time.monotonic()
+
+    _notify(job_id)
+
+
+def _update(job_id: str, **fields):
+    with _lock:
+        job = _jobs[job_id]
+        for name, value in fields.items():
+            setattr(job, name, value)
+
+
+def _notify(job_id: str):
+    job = get_job(job_id)
+    if job is None or not job.callback_url:
+        return
+
+    try:
+        resp = requests.post(
+            job.callback_url,
+            json=job.model_dump(mode="json"),
+            timeout=CALLBACK_TIMEOUT,
+        )
+        resp.raise_for_status()
+    except Exception as e:
+        logging.warning(f"callback for job {job_id} failed: {e}")
+
+
+def _prune():
+    cutoff = time.monotonic() - JOB_TTL_SECONDS
+
+    for job_id, finished in list(_finished_at.items()):
+        if finished < cutoff:
+            del _finished_at[job_id]
+            _jobs.pop(job_id, None)
@@ -1,3 +1,4 @@
+from enum import StrEnum
 from pydantic import BaseModel
 
 
@@ -6,3 +7,29 @@ class StoreResponse(BaseModel):
     file_type:str
     page_count: int
     chunks: list[str]
+
+
+class JobStage(StrEnum):
+    queued = "queued"
+    extracting = "extracting"
+    chunking = "chunking"
+    embedding = "embedding"
+    done = "done"
+    failed = "failed"
+
+
+class JobResponse(BaseModel):
+    job_id: str
+    document_id: str
+    stage: JobStage
+    progress: float = 0.0
+    result: StoreResponse | None = None
+    error: str | None = None
+    callback_url: str | None = None
+
+
+class BatchItemResponse(BaseModel):
+    url: str
+    status_code: int
+    job: JobResponse | None = None
+    error: str | None = None
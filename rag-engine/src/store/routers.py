@@ -1,10 +1,35 @@
-from fastapi import APIRouter, File, Form, UploadFile, status
+from fastapi import APIRouter, File, Form, HTTPException, UploadFile, status
 from qdrant_client.models import Optional
-from src.store.model import StoreResponse
-from src.store.controllers import pdf, md, csv, json, sheet
+from src.store.model import BatchItemResponse, JobResponse, StoreResponse
+from src.store import jobs
+from src.store.controllers import pdf, md, csv, json, sheet, batch
 
 store_upload_router = APIRouter(prefix="/store/upload", tags=["Store_Upload"])
 store_url_router = APIRouter(prefix="/store/url", tags=["Store_URL"])
+store_jobs_router = APIRouter(prefix="/store/jobs", tags=["Store_Jobs"])
+
+_JOB_RESPONSES = {
+    status.HTTP_202_ACCEPTED: {
+        "model": JobResponse,
+        "description": "Queued as a background job (background=true or callback_url set)",
+    },
+}
+
+
+@store_jobs_router.get(
+    "/{job_id}",
+    summary="Get the stage, progress and result of an ingestion job",
+    response_model=JobResponse,
+    status_code=status.HTTP_200_OK,
+)
+def get_store_job(job_id: str):
+    job = jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found",
+        )
+    return job
 
 # 1. PDF
 @store_upload_router.post(
@@ -12,113 +37,157 @@ store_url_router = APIRouter(prefix="/store/url", tags=["Store_URL"])
     summary="Store an uploaded PDF file",
     response_model=StoreResponse,
     status_code=status.HTTP_200_OK,
+    responses=_JOB_RESPONSES,
 )
 async def store_pdf_upload(
     upload: UploadFile = File(..., description="The file to upload"),
     metadata: Optional[str] = Form(..., description="Metadata for chunks (JSON)"),
+    background: bool = Form(False, description="Run ingestion as a background job"),
+    callback_url: Optional[str] = Form(None, description="URL notified when the job finishes"),
 ):
-    return await pdf.upload(upload, metadata)
+    return await pdf.upload(upload, metadata, background, callback_url)
 
 @store_url_router.post(
     "/pdf",
     summary="Store an uploaded PDF file",
     response_model=StoreResponse,
     status_code=status.HTTP_200_OK,
+    responses=_JOB_RESPONSES,
 )
-def store_pdf_with_url(
+async def store_pdf_with_url(
     url: str = Form(..., description="Link to fetch"),
     metadata: Optional[str] = Form(..., description="Metadata for chunks (JSON)"),
+    background: bool = Form(False, description="Run ingestion as a background job"),
+    callback_url: Optional[str] = Form(None, description="URL notified when the job finishes"),
 ):
-    return pdf.with_url(url, metadata)
+    return await pdf.with_url(url, metadata, background, callback_url)
 
 # 2. MDX
 @store_upload_router.post(
     "/md",
     summary="Store an uploaded Markdown / MDX file",
     status_code=status.HTTP_200_OK,
+    responses=_JOB_RESPONSES,
 )
 async def store_md_upload(
     upload: UploadFile = File(..., description="Markdown or MDX file to upload"),
     metadata: Optional[str] = Form(None, description="Metadata for chunks (JSON)"),
+    background: bool = Form(False, description="Run ingestion as a background job"),
+    callback_url: Optional[str] = Form(None, description="URL notified when the job finishes"),
 ):
-    return await md.upload(upload, metadata)
+    return await md.upload(upload, metadata, background, callback_url)
 
 @store_url_router.post(
     "/md",
     summary="Store a Markdown / MDX file from URL",
     status_code=status.HTTP_200_OK,
+    responses=_JOB_RESPONSES,
 )
-def store_md_with_url(
+async def store_md_with_url(
     url: str = Form(..., description="Link to fetch Markdown / MDX"),
     metadata: Optional[str] = Form(None, description="Metadata for chunks (JSON)"),
+    background: bool = Form(False, description="Run ingestion as a background job"),
+    callback_url: Optional[str] = Form(None, description="URL notified when the job finishes"),
 ):
-    return md.with_url(url, metadata)
+    return await md.with_url(url, metadata, background, callback_url)
 
 # 3. CSV
 @store_upload_router.post(
     "/csv",
     summary="Store an uploaded CSV file",
     status_code=status.HTTP_200_OK,
+    responses=_JOB_RESPONSES,
 )
 async def store_csv_upload(
     upload: UploadFile = File(..., description="CSV file to upload"),
     metadata: Optional[str] = Form(None, description="Metadata for chunks (JSON)"),
+    background: bool = Form(False, description="Run ingestion as a background job"),
+    callback_url: Optional[str] = Form(None, description="URL notified when the job finishes"),
 ):
-    return await csv.upload(upload, metadata)
+    return await csv.upload(upload, metadata, background, callback_url)
 
 @store_url_router.post(
     "/csv",
     summary="Store a SCV file from URL",
     status_code=status.HTTP_200_OK,
+    responses=_JOB_RESPONSES,
 )
-def store_csv_with_url(
+async def store_csv_with_url(
     url: str = Form(..., description="Link to fetch CSV"),
     metadata: Optional[str] = Form(None, description="Metadata for chunks (JSON)"),
+    background: bool = Form(False, description="Run ingestion as a background job"),
+    callback_url: Optional[str] = Form(None, description="URL notified when the job finishes"),
 ):
-    return csv.with_url(url, metadata)
+    return await csv.with_url(url, metadata, background, callback_url)
 
 # 4. JSON
 @store_upload_router.post(
     "/json",
     summary="Store an uploaded JSON file",
     status_code=status.HTTP_200_OK,
+    responses=_JOB_RESPONSES,
 )
 async def store_json_upload(
     upload: UploadFile = File(..., description="JSON file to upload"),
     metadata: Optional[str] = Form(None, description="Metadata for chunks (JSON)"),
+    background: bool = Form(False, description="Run ingestion as a background job"),
+    callback_url: Optional[str] = Form(None, description="URL notified when the job finishes"),
 ):
-    return await json.upload(upload, metadata)
+    return await json.upload(upload, metadata, background, callback_url)
 
 @store_url_router.post(
     "/json",
     summary="Store a JSON file from URL",
     status_code=status.HTTP_200_OK,
+    responses=_JOB_RESPONSES,
 )
-def store_json_with_url(
+async def store_json_with_url(
     url: str = Form(..., description="Link to fetch JSON"),
     metadata: Optional[str] = Form(None, description="Metadata for chunks (JSON)"),
+    background: bool = Form(False, description="Run ingestion as a background job"),
+    callback_url: Optional[str] = Form(None, description="URL notified when the job finishes"),
 ):
-    return json.with_url(url, metadata)
+    return await json.with_url(url, metadata, background, callback_url)
 
 # 5. Sheet
 @store_upload_router.post(
     "/sheet",
     summary="Store an uploaded sheet file",
     status_code=status.HTTP_200_OK,
+    responses=_JOB_RESPONSES,
 )
 async def store_sheet_upload(
     upload: UploadFile = File(..., description="Sheet file to upload"),
     metadata: Optional[str] = Form(None, description="Metadata for chunks (JSON)"),
+    background: bool = Form(False, description="Run ingestion as a background job"),
+    callback_url: Optional[str] = Form(None, description="URL notified when the job finishes"),
 ):
-    return await sheet.upload(upload, metadata)
+    return await sheet.upload(upload, metadata, background, callback_url)
 
 @store_url_router.post(
     "/sheet",
     summary="Store a Sheet file from URL",
     status_code=status.HTTP_200_OK,
+    responses=_JOB_RESPONSES,
 )
-def store_sheet_with_url(
+async def store_sheet_with_url(
     url: str = Form(..., description="Link to fetch Sheet"),
     metadata: Optional[str] = Form(None, description="Metadata for chunks (JSON)"),
+    background: bool = Form(False, description="Run ingestion as a background job"),
+    callback_url: Optional[str] = Form(None, description="URL notified when the job finishes"),
+):
+    return await sheet.with_url(url, metadata, background, callback_url)
+
+# 6. Batch
+@store_url_router.post(
+    "/batch",
+    summary="Fetch many files from URLs concurrently and queue each as a job",
+    response_model=list[BatchItemResponse],
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def store_batch_with_url(
+    urls: list[str] = Form(..., description="Links to fetch"),
+    metadata: Optional[str] = Form(None, description="Metadata for chunks (JSON)"),
+    callback_url: Optional[str] = Form(None, description="URL notified when each job finishes"),
 ):
-    return sheet.with_url(url, metadata)
+    return await batch.with_urls(urls, metadata, callback_url)
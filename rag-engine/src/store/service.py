@@ -1,24 +1,84 @@
 import logging
+from contextlib import contextmanager
+from itertools import islice
 
 from fastapi import HTTPException, status
-from src.layers.chunking_embedding.chunk_document import chunk_document
+from fastapi.responses import JSONResponse
+from src.layers.chunking_embedding.chunk_document import chunk_document, iter_chunks
 from src.layers.chunking_embedding.embedding import embed_chunks
-from src.layers.chunking_embedding.models import Chunk
-from src.layers.qdrant_store.store import store_chunks
-from src.layers.structure_analyzer.analyzer import analyze_layout
-from src.store.model import StoreResponse
+from src.layers.qdrant_store.store import (
+    delete_document,
+    set_document_payload,
+    store_chunks,
+)
+from src.layers.structure_analyzer.analyzer import analyze_layout, iter_layout
+from src.store import jobs
+from src.store.model import JobStage, StoreResponse
 
+STREAM_BATCH_SIZE = 64  # chunks embedded and upserted together when streaming
+
+
+def handle(
+    file_bytes: bytes,
+    metadata: dict,
+    extract_data_func,
+    background: bool = False,
+    callback_url: str | None = None,
+):
+    if background or callback_url:
+        return _enqueue(_handleFile, file_bytes, metadata, extract_data_func, callback_url)
 
-def handle(file_bytes: bytes, metadata: dict, extract_data_func):
     return process_with_error_handling(
         _handleFile, file_bytes, metadata, extract_data_func
     )
 
 
-def _handleFile(file_bytes: bytes, metadata: dict, extract_data_func):
+def handle_stream(
+    file_bytes: bytes,
+    metadata: dict,
+    stream_data_func,
+    background: bool = False,
+    callback_url: str | None = None,
+):
+    if background or callback_url:
+        return _enqueue(_handleFileStream, file_bytes, metadata, stream_data_func, callback_url)
+
+    return process_with_error_handling(
+        _handleFileStream, file_bytes, metadata, stream_data_func
+    )
+
+
+def _enqueue(handle_func, file_bytes: bytes, metadata: dict, data_func, callback_url):
+    job = jobs.submit(
+        metadata["_user_id"],
+        metadata["_file_hash"],
+        lambda progress: process_with_error_handling(
+            handle_func, file_bytes, metadata, data_func, progress=progress
+        ),
+        callback_url,
+    )
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content=job.model_dump(mode="json"),
+        headers={"Location": f"/store/jobs/{job.job_id}"},
+    )
+
+
+def _no_progress(stage: JobStage, done: int = 0, total: int = 0):
+    pass
+
+
+def _handleFile(
+    file_bytes: bytes,
+    metadata: dict,
+    extract_data_func,
+    progress: jobs.Progress = _no_progress,
+):
     file_type = metadata.get("_file_type")
+    progress(JobStage.extracting, 0, 0)
     pages, extractor_meta = extract_data_func(file_bytes)
     logging.info(f"{file_type} data extracted pages: {len(pages)}")
+    progress(JobStage.chunking, 0, 0)
     structured_document = analyze_layout(pages)
     logging.info(f"analyzed {file_type} structured")
     chunks = chunk_document(
@@ -28,30 +88,123 @@ def _handleFile(file_bytes: bytes, metadata: dict, extract_data_func):
         min_tokens=80,
     )
     logging.info(f"chunked {file_type} to : {len(chunks)} chunks")
-    chunks = embed_chunks(chunks)
-    logging.info("embedding chunks")
-    store_chunks(chunks)
+
+    chunk_ids: list[str] = []
+    with _removed_on_failure(metadata, chunk_ids):
+        for start in range(0, len(chunks), STREAM_BATCH_SIZE):
+            progress(JobStage.embedding, start, len(chunks))
+            batch = embed_chunks(chunks[start : start + STREAM_BATCH_SIZE])
+            store_chunks(batch)
+            chunk_ids.extend(chunk.id for chunk in batch)
+
     logging.info("stored chunked")
-    return makeResponse(metadata | extractor_meta, chunks)
+    return makeResponse(metadata | extractor_meta, chunk_ids)
+
+
+def _handleFileStream(
+    file_bytes: bytes,
+    metadata: dict,
+    stream_data_func,
+    progress: jobs.Progress = _no_progress,
+):
+    """
+    Page-at-a-time variant of _handleFile: pages flow through layout
+    analysis and chunking lazily, and chunks are embedded and upserted in
+    rolling batches, so memory stays bounded and early chunks become
+    searchable while later pages are still being parsed.
+
+    Extraction and chunking interleave, so a job alternates between
+    `chunking` (reading the next batch) and `embedding`, and its progress
+    is how far through the source the stored chunks reach.
+    """
+    file_type = metadata.get("_file_type")
+    progress(JobStage.extracting, 0, 0)
+    pages, extractor_meta = stream_data_func(file_bytes)
+    chunk_meta = metadata | extractor_meta
+    logging.info(f"{file_type} streaming pages: {chunk_meta.get('_page_count')}")
+
+    position = _SourcePosition(chunk_meta.get("_page_count", 0), len(file_bytes))
+    chunks = iter_chunks(
+        iter_layout(position.track(pages)),
+        chunk_meta,
+        max_tokens=450,
+        min_tokens=80,
+    )
+
+    chunk_ids: list[str] = []
+    with _removed_on_failure(metadata, chunk_ids):
+        while True:
+            progress(JobStage.chunking, position.done, position.total)
+            batch = list(islice(chunks, STREAM_BATCH_SIZE))
+            if not batch:
+                break
+
+            progress(JobStage.embedding, position.done, position.total)
+            batch = embed_chunks(batch)
+            store_chunks(batch)
+            chunk_ids.extend(chunk.id for chunk in batch)
+            logging.info(f"stored {len(chunk_ids)} {file_type} chunks so far")
+
+        # metadata the extractor only knew at the end, e.g. a CSV's row count
+        late = {k: v for k, v in extractor_meta.items() if chunk_meta.get(k) != v}
+        if late and chunk_ids:
+            set_document_payload(metadata["_user_id"], metadata["_file_hash"], late)
+        chunk_meta |= late
+
+    logging.info(f"streamed {file_type} to : {len(chunk_ids)} chunks")
+    return makeResponse(chunk_meta, chunk_ids)
+
+
+class _SourcePosition:
+    """How far the page stream has read, for progress reporting."""
+
+    def __init__(self, page_count: int, source_size: int):
+        self.done = 0
+        self.total = page_count
+        self.source_size = source_size
+
+    def track(self, pages):
+        for page in pages:
+            if page.source_offset is not None:
+                # one long page, e.g. a CSV or JSON file: by bytes read
+                self.done, self.total = page.source_offset, self.source_size
+            else:
+                # by page number, since a page can arrive as several windows
+                self.done = page.page_number
+            yield page
+
+
+@contextmanager
+def _removed_on_failure(metadata: dict, chunk_ids: list[str]):
+    try:
+        yield
+    except Exception:
+        # don't leave a half-ingested document behind to trip the dedupe check
+        if chunk_ids:
+            delete_document(metadata["_user_id"], metadata["_file_hash"])
+        raise
 
 
-def makeResponse(metadata: dict, chunks: list[Chunk]) -> StoreResponse:
+def makeResponse(metadata: dict, chunk_ids: list[str]) -> StoreResponse:
     return StoreResponse(
         document_id=metadata["_file_hash"],
         file_type=metadata["_file_type"],
         page_count=metadata["_page_count"],
-        chunks=[chunk.id for chunk in chunks],
+        chunks=chunk_ids,
     )
 
 
 def process_with_error_handling(process_func, *args, **kwargs):
     """
     Execute process_func and convert exceptions to HTTPException.
+    - HTTPException (e.g. 503 while a model is unavailable) -> as is
     - ValueError -> 400 Bad Request
     - Other Exception -> 500 Internal Server Error (with generic message)
     """
     try:
         return process_func(*args, **kwargs)
+    except HTTPException:
+        raise
     except ValueError as e:
         # Client error – include the message
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
@@ -0,0 +1,163 @@
+"""
+Dense model options side by side: passage throughput and retrieval
+quality on a local eval set, with the quality delta against a baseline
+option, so a faster model is picked with evidence.
+
+The eval set is a JSON file (see tests/data/dense_eval.json):
+
+    {
+      "corpus":  [{"id": "d1", "text": "..."}, ...],
+      "queries": [{"query": "...", "relevant": ["d1", ...]}, ...]
+    }
+
+Every passage is embedded with the option's passage prefix and every
+query with its query prefix, as ingestion and /query do. Queries are
+ranked over the whole corpus by cosine similarity.
+
+    python -m tests.bench_dense_models [--eval tests/data/dense_eval.json] \
+        [--models e5-small e5-small-int8 ...] [--baseline e5-small] [--max-drop 0.02]
+
+An option whose recall@k falls more than --max-drop below the baseline
+fails the quality gate, and the script exits with status 1.
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from fastembed import TextEmbedding
+
+from src.common.dense_models import DENSE_MODELS, DenseModelOption, register_custom
+from src.common.inference import ONNX_THREADS
+
+
+EVAL_SET = Path(__file__).parent / "data" / "dense_eval.json"
+CALL_SIZE = 16  # texts per model call, as ingestion schedules them
+MIN_TIMED_PASSAGES = 256
+
+
+def load_eval(path: Path) -> tuple[list[str], list[str], list[tuple[str, set[str]]]]:
+    data = json.loads(path.read_text())
+    ids = [doc["id"] for doc in data["corpus"]]
+    texts = [doc["text"] for doc in data["corpus"]]
+    queries = [(q["query"], set(q["relevant"])) for q in data["queries"]]
+
+    unknown = {r for _, relevant in queries for r in relevant} - set(ids)
+    if unknown:
+        raise ValueError(f"relevant ids missing from the corpus: {sorted(unknown)}")
+
+    return ids, texts, queries
+
+
+def embed(model: TextEmbedding, texts: list[str]) -> np.ndarray:
+    vectors = np.array(list(model.embed(texts, batch_size=CALL_SIZE)), dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def throughput(model: TextEmbedding, option: DenseModelOption, texts: list[str]) -> float:
+    """Passages per second, over at least MIN_TIMED_PASSAGES passages."""
+    passages = [f"{option.passage_prefix}{t}" for t in texts]
+    passages = passages * -(-MIN_TIMED_PASSAGES // len(passages))
+
+    started = time.perf_counter()
+    for i in range(0, len(passages), CALL_SIZE):
+        list(model.embed(passages[i : i + CALL_SIZE], batch_size=CALL_SIZE))
+    return len(passages) / (time.perf_counter() - started)
+
+
+def retrieval_quality(
+    model: TextEmbedding,
+    option: DenseModelOption,
+    ids: list[str],
+    texts: list[str],
+    queries: list[tuple[str, set[str]]],
+    k: int,
+) -> dict[str, float]:
+    passages = embed(model, [f"{option.passage_prefix}{t}" for t in texts])
+    asked = embed(model, [f"{option.query_prefix}{q}" for q, _ in queries])
+
+    recall = 0.0
+    reciprocal_rank = 0.0
+
+    for scores, (_, relevant) in zip(asked @ passages.T, queries):
+        ranked = [ids[i] for i in np.argsort(-scores)]
+
+        recall += len(relevant & set(ranked[:k])) / len(relevant)
+        first = next((rank for rank, doc in enumerate(ranked, 1) if doc in relevant), None)
+        if first is not None and first <= 10:
+            reciprocal_rank += 1 / first
+
+    return {
+        f"recall@{k}": recall / len(queries),
+        "mrr@10": reciprocal_rank / len(queries),
+    }
+
+
+def bench(name: str, ids, texts, queries, k: int, cache_dir: str) -> dict:
+    option = DENSE_MODELS[name]
+    register_custom(option)
+
+    started = time.perf_counter()
+    model = TextEmbedding(model_name=option.name, cache_dir=cache_dir, threads=ONNX_THREADS)
+    list(model.embed(["warm up"]))
+    load_seconds = time.perf_counter() - started
+
+    return {
+        "model": name,
+        "dim": model.embedding_size,
+        "load_s": load_seconds,
+        "passages_per_s": throughput(model, option, texts),
+        **retrieval_quality(model, option, ids, texts, queries, k),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--eval", type=Path, default=EVAL_SET)
+    parser.add_argument("--models", nargs="+", default=list(DENSE_MODELS))
+    parser.add_argument("--baseline", default="e5-small")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--max-drop", type=float, default=0.02)
+    parser.add_argument("--cache-dir", default="./models_cache")
+    args = parser.parse_args()
+
+    ids, texts, queries = load_eval(args.eval)
+    names = [args.baseline] + [m for m in args.models if m != args.baseline]
+    results = [bench(name, ids, texts, queries, args.k, args.cache_dir) for name in names]
+
+    recall = f"recall@{args.k}"
+    baseline = results[0]
+    failed = []
+
+    print(
+        f"{len(texts)} passages, {len(queries)} queries, "
+        f"{ONNX_THREADS} ONNX threads, baseline {args.baseline}\n"
+    )
+    print(
+        f"{'model':<22}{'dim':>5}{'load s':>8}{'pass/s':>9}{'speedup':>9}"
+        f"{recall:>11}{'delta':>8}{'mrr@10':>8}{'delta':>8}  gate"
+    )
+    for r in results:
+        drop = baseline[recall] - r[recall]
+        ok = drop <= args.max_drop
+        if not ok:
+            failed.append(r["model"])
+
+        print(
+            f"{r['model']:<22}{r['dim']:>5}{r['load_s']:>8.1f}{r['passages_per_s']:>9.1f}"
+            f"{r['passages_per_s'] / baseline['passages_per_s']:>8.2f}x"
+            f"{r[recall]:>11.3f}{r[recall] - baseline[recall]:>+8.3f}"
+            f"{r['mrr@10']:>8.3f}{r['mrr@10'] - baseline['mrr@10']:>+8.3f}"
+            f"  {'pass' if ok else 'FAIL'}"
+        )
+
+    if failed:
+        print(f"\n{', '.join(failed)}: {recall} drops more than {args.max_drop}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
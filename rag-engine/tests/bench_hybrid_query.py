@@ -0,0 +1,125 @@
+"""
+Hybrid search latency: one query_points call per query variant, as the
+search stage used to do, vs every variant in one query_batch_points.
+
+Point it at a real Qdrant to include network round trips; the default
+in-memory client only shows the per-call overhead. The benchmark
+creates, and then drops, its own collection.
+
+    QDRANT_DB_URL=http://localhost:6333 python -m tests.bench_hybrid_query \
+        [--variants 4] [--points 5000] [--repeat 50]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+import uuid
+
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http import models
+
+from src.query.service import _hits_from_responses, _hybrid_requests
+
+
+DIM = 384
+VOCAB = 30_000
+
+
+def _dense(rng: random.Random) -> list[float]:
+    return [rng.gauss(0, 1) for _ in range(DIM)]
+
+
+def _sparse(rng: random.Random) -> models.SparseVector:
+    indices = sorted(rng.sample(range(VOCAB), 40))
+    return models.SparseVector(indices=indices, values=[rng.random() for _ in indices])
+
+
+async def _fill(client: AsyncQdrantClient, collection: str, points: int, rng: random.Random):
+    await client.create_collection(
+        collection_name=collection,
+        vectors_config={
+            "text-dense": models.VectorParams(size=DIM, distance=models.Distance.COSINE),
+        },
+        sparse_vectors_config={"text-sparse": models.SparseVectorParams()},
+    )
+
+    for start in range(0, points, 256):
+        await client.upsert(
+            collection_name=collection,
+            points=[
+                models.PointStruct(
+                    id=i,
+                    vector={"text-dense": _dense(rng), "text-sparse": _sparse(rng)},
+                    payload={"_text": f"chunk {i}", "_user_id": f"u{i % 4}"},
+                )
+                for i in range(start, min(start + 256, points))
+            ],
+            wait=True,
+        )
+
+
+async def _per_variant(client: AsyncQdrantClient, collection: str, requests):
+    responses = []
+    for req in requests:
+        responses.append(
+            await client.query_points(
+                collection_name=collection,
+                prefetch=req.prefetch,
+                query=req.query,
+                limit=req.limit,
+                with_payload=req.with_payload,
+            )
+        )
+    return responses
+
+
+async def _batched(client: AsyncQdrantClient, collection: str, requests):
+    return await client.query_batch_points(collection_name=collection, requests=requests)
+
+
+async def main(url: str, variants: int, points: int, repeat: int):
+    rng = random.Random(0)
+    client = AsyncQdrantClient(url) if url == ":memory:" else AsyncQdrantClient(url=url)
+    collection = f"bench_hybrid_{uuid.uuid4().hex[:8]}"
+
+    meta_filter = models.Filter(
+        must=[models.FieldCondition(key="_user_id", match=models.MatchValue(value="u1"))]
+    )
+
+    try:
+        await _fill(client, collection, points, rng)
+
+        for name, search in [("per-variant", _per_variant), ("batched", _batched)]:
+            timings = []
+            for _ in range(repeat):
+                embeddings = [
+                    {"dense": _dense(rng), "sparse": _sparse(rng)} for _ in range(variants)
+                ]
+                requests = _hybrid_requests(embeddings, meta_filter, 50)
+
+                started = time.perf_counter()
+                hits = _hits_from_responses(await search(client, collection, requests))
+                timings.append((time.perf_counter() - started) * 1000)
+
+            timings.sort()
+            print(
+                f"{name:>12}: p50 {statistics.median(timings):7.2f} ms  "
+                f"p95 {timings[max(0, int(len(timings) * 0.95) - 1)]:7.2f} ms  "
+                f"({variants} variants, {len(hits)} hits, {url})"
+            )
+    finally:
+        await client.delete_collection(collection)
+        await client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=os.getenv("QDRANT_DB_URL") or ":memory:")
+    parser.add_argument("--variants", type=int, default=4)
+    parser.add_argument("--points", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.url, args.variants, args.points, args.repeat))
@@ -0,0 +1,27 @@
+"""
+Line building on a dense, table-heavy page: legacy all-lines scan vs the
+sorted sweep.
+
+    python -m tests.bench_pdf_lines [words] [rows]
+"""
+import sys
+import timeit
+
+from src.layers.data_extractor.extractor import pdf
+from tests import legacy_pdf
+from tests.pdf_fixtures import random_page_words
+
+
+def main(count: int = 6000, rows: int = 300, repeat: int = 5):
+    words = random_page_words(count, rows, seed=99)
+
+    for name, build in [
+        ("legacy", legacy_pdf.group_words_into_lines),
+        ("sweep", pdf._group_words_into_lines),
+    ]:
+        best = min(timeit.repeat(lambda: build(words), number=1, repeat=repeat))
+        print(f"{name:>8}: {best * 1000:8.1f} ms  ({count} words, {rows} rows)")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
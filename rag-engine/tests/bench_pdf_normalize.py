@@ -0,0 +1,28 @@
+"""
+Page text normalisation: legacy multi-pass pipeline vs the single pass.
+
+    python -m tests.bench_pdf_normalize [copies]
+"""
+import sys
+import timeit
+
+from src.layers.data_extractor.extractor import pdf
+from tests import legacy_pdf
+from tests.pdf_fixtures import FIXTURES
+
+
+def main(copies: int = 20, repeat: int = 20):
+    text = (FIXTURES / "dcup_how_it_works.txt").read_text() * copies
+    # add every rule's input, not just prose
+    page = "\n".join(text.splitlines() + ["12", "...........", "Foo-", "bar", "a"] * 200)
+
+    for name, normalize in [
+        ("legacy", legacy_pdf.normalize_text),
+        ("one-pass", pdf._normalize_text),
+    ]:
+        best = min(timeit.repeat(lambda: normalize(page), number=1, repeat=repeat))
+        print(f"{name:>8}: {best * 1000:8.2f} ms  ({len(page) // 1024} KB page)")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,81 @@
+"""
+Table chunking throughput: a large sheet streamed in windows, as the
+CSV and XLSX extractors hand it down, packed into token-bounded chunks.
+
+    python -m tests.bench_table_chunks [--rows 100000] [--max-tokens 450] [--repeat 3]
+"""
+import argparse
+import random
+import time
+
+from src.layers.chunking_embedding.chunk_document import _TableRun
+from src.layers.data_extractor.models import TablePage
+from src.layers.structure_analyzer.models import Section
+
+
+HEADERS = ["order_id", "customer", "region", "product", "qty", "unit_price", "status", "date"]
+WORDS = "north south east west widget gadget pending shipped cancelled alice bob carol".split()
+WINDOW_ROWS = 256
+
+
+def _rows(count: int, rng: random.Random) -> list[list[str]]:
+    return [
+        [
+            str(100000 + i),
+            f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()}",
+            rng.choice(WORDS),
+            rng.choice(WORDS),
+            str(rng.randint(1, 50)),
+            f"{rng.random() * 100:.2f}",
+            rng.choice(WORDS),
+            f"2024-0{rng.randint(1, 9)}-{rng.randint(10, 28)}",
+        ]
+        for i in range(count)
+    ]
+
+
+def _window(rows: list, offset: int) -> TablePage:
+    return TablePage(
+        id="bench",
+        bbox=(0, 0, 0, 0),
+        data=[HEADERS] + rows,
+        top=0,
+        x0=0,
+        x1=0,
+        bottom=0,
+        page_number=1,
+        row_offset=offset,
+    )
+
+
+def chunk_table(rows: list, max_tokens: int) -> list:
+    section = Section(
+        id="s", title="Sheet", level=1, page_number=1, confidence=1.0, content_stream=[]
+    )
+    run = _TableRun(_window([], 0), section, ["Sheet"], max_tokens, {})
+
+    chunks = []
+    for start in range(0, len(rows), WINDOW_ROWS):
+        chunks.extend(run.add_table(_window(rows[start : start + WINDOW_ROWS], start)))
+    chunks.extend(run.flush())
+    return chunks
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--max-tokens", type=int, default=450)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rows = _rows(args.rows, random.Random(0))
+    timings = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        chunks = chunk_table(rows, args.max_tokens)
+        timings.append(time.perf_counter() - started)
+
+    print(
+        f"{args.rows} rows x {len(HEADERS)} columns: best {min(timings):.2f} s, "
+        f"{len(chunks)} chunks, max {max(c.token_count for c in chunks)} tokens"
+    )
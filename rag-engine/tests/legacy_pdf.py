@@ -0,0 +1,111 @@
+"""
+The PDF line builder and text normaliser as they were before the
+single-pass rewrites, kept as the reference the new code is checked and
+benchmarked against.
+"""
+import re
+from typing import List
+
+from src.layers.data_extractor.models import Line, Word
+
+
+LINE_TOLERANCE = 3
+
+
+def group_words_into_lines(words: List[Word]) -> List[Line]:
+
+    if not words:
+        return []
+
+    words_sorted = sorted(words, key=lambda w: (w.top, w.x0))
+
+    line_clusters: List[List[Word]] = []
+
+    for word in words_sorted:
+        placed = False
+
+        for cluster in line_clusters:
+            if abs(cluster[0].top - word.top) <= LINE_TOLERANCE:
+                cluster.append(word)
+                placed = True
+                break
+
+        if not placed:
+            line_clusters.append([word])
+
+    lines_output: List[Line] = []
+
+    for cluster in line_clusters:
+        cluster = sorted(cluster, key=lambda w: w.x0)
+
+        line_text = " ".join(w.text for w in cluster)
+
+        avg_size = sum(w.size for w in cluster) / len(cluster)
+
+        is_bold = any("bold" in w.fontname.lower() for w in cluster)
+
+        x0 = min(w.x0 for w in cluster)
+        x1 = max(w.x1 for w in cluster)
+
+        top = min(w.top for w in cluster)
+        bottom = max(w.bottom for w in cluster)
+
+        lines_output.append(
+            Line(
+                text=line_text,
+                words=cluster,
+                top=top,
+                avg_size=avg_size,
+                is_bold=is_bold,
+                x0=x0,
+                x1=x1,
+                bottom=bottom,
+            )
+        )
+
+    # Sort final lines vertically
+    lines_output.sort(key=lambda lin: lin.top)
+
+    return lines_output
+
+
+def normalize_text(text: str) -> str:
+    text = _fix_hyphen_breaks(text)
+    text = _remove_page_numbers(text)
+    text = _remove_dot_lines(text)
+    text = _remove_lonely_symbols(text)
+    text = _fix_merged_words(text)
+    text = _normalize_spaces(text)
+
+    text = "\n".join(line.rstrip() for line in text.splitlines())
+    text = re.sub(r"\n{3,}", "\n\n", text)
+
+    return text.strip()
+
+
+def _fix_hyphen_breaks(text: str) -> str:
+    return re.sub(r"-\n(\w)", r"\1", text)
+
+
+def _remove_page_numbers(text: str) -> str:
+    return "\n".join(line for line in text.splitlines() if not line.strip().isdigit())
+
+
+def _normalize_spaces(text: str) -> str:
+    return re.sub(r"[ \t]+", " ", text)
+
+
+def _remove_dot_lines(text: str) -> str:
+    return "\n".join(
+        line
+        for line in text.splitlines()
+        if not re.match(r"^(\.\s?){5,}$", line.strip())
+    )
+
+
+def _remove_lonely_symbols(text: str) -> str:
+    return "\n".join(line for line in text.splitlines() if len(line.strip()) > 2)
+
+
+def _fix_merged_words(text: str) -> str:
+    return re.sub(r"([a-z])([A-Z])", r"\1 \2", text)
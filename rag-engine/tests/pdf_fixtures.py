@@ -0,0 +1,52 @@
+import random
+from pathlib import Path
+from typing import Iterator, List
+
+import pdfplumber
+
+from src.layers.data_extractor.extractor import pdf
+from src.layers.data_extractor.models import Word
+
+
+FIXTURES = Path(__file__).resolve().parents[2] / "cypress" / "fixtures"
+
+
+def fixture_pdfs() -> list[Path]:
+    return sorted(FIXTURES.glob("*.pdf"))
+
+
+def fixture_page_words(path: Path) -> Iterator[List[Word]]:
+    """Table-filtered words of every page, as the extractor sees them."""
+    with pdfplumber.open(path) as pdf_doc:
+        for page_number, page in enumerate(pdf_doc.pages, start=1):
+            tables = pdf._extract_tables(page, page_number)
+            yield pdf._extract_words(page, tables)
+
+
+def random_page_words(count: int, rows: int, seed: int) -> List[Word]:
+    """Words scattered over `rows` slightly jittered baselines."""
+    rng = random.Random(seed)
+    words = []
+
+    for i in range(count):
+        top = rng.randrange(rows) * 9.7 + rng.uniform(-2, 2)
+        x0 = rng.uniform(0, 600)
+        words.append(
+            Word(
+                text=f"w{i}",
+                x0=x0,
+                x1=x0 + rng.uniform(5, 40),
+                top=top,
+                bottom=top + rng.choice([8, 9.5, 10]),
+                size=rng.choice([8, 9, 9.5, 10.25, 12]),
+                fontname=rng.choice(["Arial", "Arial-Bold", "Times"]),
+            )
+        )
+
+    return words
+
+
+def fixture_page_texts(path: Path) -> Iterator[str]:
+    """Raw page text handed to the normaliser."""
+    for words in fixture_page_words(path):
+        yield "\n".join(line.text for line in pdf._group_words_into_lines(words))
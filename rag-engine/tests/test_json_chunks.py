@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+from src.layers.chunking_embedding.chunk_document import chunk_document, iter_chunks
+from src.layers.data_extractor.extractor import json as json_extractor
+from src.layers.data_extractor.extractor.json import extract_data_json, stream_data_json
+from src.layers.structure_analyzer.analyzer import analyze_layout, iter_layout
+
+
+DOCUMENTS = [
+    {
+        "billing": {"address": {"city": "Paris", "zip": "75001"}},
+        "shipping": {"address": {"city": "Berlin", "zip": "10115"}},
+    },
+    {
+        "server": {"host": "localhost", "port": 8080, "tls": False, "timeout": 30.5},
+        "db": {"user": "admin", "pool": 10, "name": "main"},
+    },
+    {"name": "svc", "version": "1.2.3", "env": {"DEBUG": "0"}, "region": "eu-west"},
+    {
+        "tags": ["red", "green", "blue"],
+        "matrix": [[1, 2], [3, 4]],
+        "empty": {},
+        "none": None,
+        "nested": {"a": {"b": {"c": {"d": {"e": {"f": {"g": "deep"}}}}}}},
+    },
+    ["alpha", "beta", {"k": "v"}, [{"id": 7}], "omega"],
+    "just a string",
+    {
+        "users": [{"id": 1, "name": "Ann"}, {"id": 2, "name": "Bob", "role": "ops"}],
+        "count": 2,
+        "note": "A longer free text note that runs on for well over twelve words in total.",
+    },
+]
+
+
+def _leaves(value):
+    if isinstance(value, dict):
+        for item in value.values():
+            yield from _leaves(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _leaves(item)
+    else:
+        yield str(value)
+
+
+def _chunks(data: bytes, stream: bool):
+    if stream:
+        pages, metadata = stream_data_json(data)
+        return list(iter_chunks(iter_layout(pages), metadata))
+
+    pages, metadata = extract_data_json(data)
+    return chunk_document(analyze_layout(pages), metadata)
+
+
+@pytest.mark.parametrize("stream", [False, True], ids=["full", "stream"])
+@pytest.mark.parametrize("document", DOCUMENTS, ids=lambda d: json.dumps(d)[:24])
+def test_every_scalar_reaches_chunk_text(document, stream):
+    chunks = _chunks(json.dumps(document).encode(), stream)
+    text = "\n".join(c.text for c in chunks)
+
+    assert [leaf for leaf in _leaves(document) if leaf not in text] == []
+
+
+@pytest.mark.parametrize("stream", [False, True], ids=["full", "stream"])
+def test_values_nest_under_their_keys(stream, monkeypatch):
+    # small pages, so the streaming path sees headings across page breaks
+    monkeypatch.setattr(json_extractor, "JSON_PAGE_LINES", 4)
+    document = {
+        key: {"address": {"city": f"{key} city " * 120, "zip": f"{key} zip"}}
+        for key in ("billing", "shipping")
+    }
+
+    chunks = _chunks(json.dumps(document).encode(), stream)
+
+    for key in ("billing", "shipping"):
+        owners = {tuple(c.section_path) for c in chunks if f"{key} zip" in c.text}
+        assert owners == {("JSON Document", key, "address")}
@@ -0,0 +1,33 @@
+import random
+
+import pytest
+
+from src.layers.data_extractor.extractor import pdf
+from tests import legacy_pdf
+from tests.pdf_fixtures import fixture_page_words, fixture_pdfs, random_page_words
+
+
+def _dump(lines):
+    return [line.model_dump() for line in lines]
+
+
+@pytest.mark.parametrize("path", fixture_pdfs(), ids=lambda p: p.name)
+def test_lines_match_legacy_on_fixtures(path):
+    for words in fixture_page_words(path):
+        assert _dump(pdf._group_words_into_lines(words)) == _dump(
+            legacy_pdf.group_words_into_lines(words)
+        )
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_lines_match_legacy_on_random_pages(seed):
+    rng = random.Random(seed)
+    words = random_page_words(rng.randint(1, 800), rng.randint(1, 90), seed)
+
+    assert _dump(pdf._group_words_into_lines(words)) == _dump(
+        legacy_pdf.group_words_into_lines(words)
+    )
+
+
+def test_no_words_no_lines():
+    assert pdf._group_words_into_lines([]) == []
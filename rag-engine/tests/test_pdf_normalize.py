@@ -0,0 +1,48 @@
+import random
+
+import pytest
+
+from src.layers.data_extractor.extractor import pdf
+from tests import legacy_pdf
+from tests.pdf_fixtures import FIXTURES, fixture_page_texts, fixture_pdfs
+
+
+# fragments that exercise every rule, including splitlines-only separators
+ALPHABET = list("ab-AB1 2\t\n.. \r_\xa0 é-\n\n") + [
+    "....", ". . . . .", "12", "Page", "word", "-\n", "x-\ny", "\x0c", "\r\n", "³",
+]
+
+
+@pytest.mark.parametrize("path", fixture_pdfs(), ids=lambda p: p.name)
+def test_normalize_matches_legacy_on_fixture_pdfs(path):
+    for text in fixture_page_texts(path):
+        assert pdf._normalize_text(text) == legacy_pdf.normalize_text(text)
+
+
+@pytest.mark.parametrize("path", sorted(FIXTURES.glob("*.txt")), ids=lambda p: p.name)
+def test_normalize_matches_legacy_on_fixture_text(path):
+    text = path.read_text()
+    assert pdf._normalize_text(text) == legacy_pdf.normalize_text(text)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_normalize_matches_legacy_on_random_text(seed):
+    rng = random.Random(seed)
+
+    for _ in range(2000):
+        text = "".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 30)))
+        assert pdf._normalize_text(text) == legacy_pdf.normalize_text(text), repr(text)
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("hyphen-\nated word", "hyphenated word"),
+        ("intro text\n12\nmore text", "intro text\nmore text"),
+        ("Contents\n. . . . . . .\nend here", "Contents\nend here"),
+        ("keep this\n•\nand this", "keep this\nand this"),
+        ("camelCase  and\ttabs", "camel Case and tabs"),
+    ],
+)
+def test_normalize_rules(text, expected):
+    assert pdf._normalize_text(text) == expected